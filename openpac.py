@@ -1,24 +1,61 @@
+import time
+STARTUP_T0 = time.perf_counter()  # startup timeline origin (see StartupTimeline)
+
 import pygame
 import sys
 import json
 import os
 import random
+import base64
+import hashlib
+import zlib
+import queue
+import collections
+import threading
+import functools
+
+try:
+    import numpy as np
+except ImportError:  # only needed for the many-ghost stress mode
+    np = None
 
-pygame.init()
-pygame.joystick.init()
+# SDL subsystems are initialized by Game (display and fonts first, the rest
+# after the first frame), so importing this module for tooling stays cheap
 
 # Constants
 TILE = 32
 WIDTH, HEIGHT = 28, 31
 SCREEN_WIDTH = WIDTH * TILE
 SCREEN_HEIGHT = HEIGHT * TILE
-FPS = 60
+FPS = 60  # simulation ticks per second; rendering is capped separately by Game.max_fps
+MAX_CATCH_UP = 0.25  # most simulation time (seconds) replayed after a stalled frame
 
 # Colors
 BLACK = (0, 0, 0)
 BLUE = (0, 0, 255)
 YELLOW = (255, 255, 0)
 WHITE = (255, 255, 255)
+GHOST_COLORS = [(255,0,0), (255,184,255), (0,255,255), (255,184,82), (0,255,0)]
+
+# Ghost house: interior columns 11-16, rows 13-15, walled in with the door in
+# the top wall, so the whole block is columns 10-17, rows 12-16
+HOUSE_LEFT, HOUSE_RIGHT = 10, 17  # columns, side walls included
+HOUSE_TOP, HOUSE_BOTTOM = 12, 16  # rows, door row and bottom wall included
+HOUSE_DOOR_COLS = (13, 14)
+HOUSE_DOOR_X = TILE * 14  # pixel x between the two door columns
+HOUSE_EXIT_Y = TILE * 11 + TILE // 2  # center of row 11, the corridor above the door
+HOUSE_HOME_Y = TILE * 13 + TILE // 2  # eaten ghosts restart on the top interior row
+# Tunnel: 'T' tiles at both ends of one row; ghosts are slowed in those columns
+TUNNEL_ROW = 14
+TUNNEL_LENGTH = 6
+
+# Ghost personalities (by ghost index) and the corner tiles they head for when scattering
+GHOST_STRATEGIES = ['chase', 'ambush', 'flank', 'shy', 'patrol']
+SCATTER_CORNERS = [(WIDTH - 2, 1), (1, 1), (WIDTH - 2, HEIGHT - 2), (1, HEIGHT - 2), (WIDTH // 2, HEIGHT - 2)]
+# Alternating scatter/chase phases in seconds, starting with scatter; chase for good afterwards
+SCATTER_WAVES = [7, 20, 7, 20, 5, 20, 5]
+SHY_DISTANCE = 8  # path length (tiles) at which 'shy' gives up the chase and 'patrol' starts it
+PATH_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'openpac')  # unless OPENPAC_CACHE is set
 
 class Controls:
     def __init__(self):
@@ -33,24 +70,723 @@ class Controls:
                     self.gp = d.get('gamepad', self.gp)
             except: pass
 
+class InputLayer:
+    """Maps keyboard, hat and gamepad button events to actions and measures input latency.
+
+    Every key in Controls.kb (plus the arrow keys), every button in
+    Controls.gp and the joystick hat become the same (action, pressed)
+    pairs. Directions are only taken from presses, so a key that is still
+    held can't overwrite a newer turn; the newest held one is available for
+    re-sending after a respawn (held()).
+
+    Latency is timed from when the event was read (pygame events carry no
+    timestamp, so this is the start of the frame that polled it) to the end
+    of the flip of the first frame drawn after the tick that applied it.
+    Turn waits are the ticks from that tick until the player actually took
+    the turn; turns replaced by another press before that count as missed.
+    """
+    DIRECTIONS = {'up': (0, -1), 'down': (0, 1), 'left': (-1, 0), 'right': (1, 0)}
+    ARROWS = {pygame.K_UP: 'up', pygame.K_DOWN: 'down', pygame.K_LEFT: 'left', pygame.K_RIGHT: 'right'}
+
+    def __init__(self, controls):
+        self.keys = dict(self.ARROWS)
+        self.keys.update({key: action for action, key in controls.kb.items()})
+        self.buttons = {button: action for action, button in controls.gp.items()}
+        self.hat = (0, 0)
+        self.pressed = {}  # held direction -> time it was pressed
+        self.pending = []  # read times of turns not yet applied by a tick
+        self.applied = []  # applied turns not yet on screen
+        self.turn = None  # [direction, ticks waited, player] requested but not taken yet
+        self.latency_ms = collections.deque(maxlen=4096)
+        self.turn_wait_ms = collections.deque(maxlen=4096)
+        self.missed = 0
+
+    def translate(self, e):
+        """The (action, pressed) pairs of one pygame event; empty if it maps to no action."""
+        if e.type in (pygame.KEYDOWN, pygame.KEYUP):
+            action = self.keys.get(e.key)
+            return [(action, e.type == pygame.KEYDOWN)] if action else []
+        if e.type in (pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP):
+            action = self.buttons.get(e.button)
+            return [(action, e.type == pygame.JOYBUTTONDOWN)] if action else []
+        if e.type == pygame.JOYHATMOTION and e.hat == 0:
+            # A hat motion releases the old direction and presses the new one
+            old, self.hat = self.hat, e.value
+            names = lambda hx, hy: {'left' if hx < 0 else 'right' if hx > 0 else None,
+                                    'up' if hy > 0 else 'down' if hy < 0 else None} - {None}
+            before, after = names(*old), names(*e.value)
+            return [(a, False) for a in before - after] + [(a, True) for a in after - before]
+        return []
+
+    def press(self, action, pressed, t):
+        """Track a direction press or release; returns the direction to turn to, if any."""
+        if not pressed:
+            self.pressed.pop(action, None)
+            return None
+        self.pressed[action] = t
+        return self.DIRECTIONS[action]
+
+    def held(self):
+        """The most recently pressed direction that is still held, or None."""
+        if not self.pressed:
+            return None
+        return self.DIRECTIONS[max(self.pressed, key=self.pressed.get)]
+
+    def request(self, t):
+        self.pending.append(t)
+
+    def ticked(self, direction, player):
+        """Called after every simulation tick with the direction it was given."""
+        if self.turn is not None and self.turn[2] is not player:
+            self.turn = None  # died or finished the level before turning
+        if direction is not None:
+            if self.turn is not None and self.turn[0] != direction:
+                self.missed += 1
+            self.turn = [direction, 0, player]
+            self.applied.extend(self.pending)
+            self.pending.clear()
+        if self.turn is not None:
+            if player.dir == self.turn[0]:
+                self.turn_wait_ms.append(self.turn[1] * 1000.0 / FPS)
+                self.turn = None
+            else:
+                self.turn[1] += 1
+
+    def presented(self, now):
+        """Called once the frame is on screen."""
+        for t in self.applied:
+            self.latency_ms.append((now - t) * 1000.0)
+        self.applied.clear()
+
+    def report(self):
+        def stats(samples):
+            if not samples:
+                return "no samples"
+            ordered = sorted(samples)
+            pick = lambda p: ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+            return f"p50 {pick(0.5):6.2f}  p95 {pick(0.95):6.2f}  max {ordered[-1]:6.2f} ms  ({len(ordered)} turns)"
+        return "\n".join([f"input to display  {stats(self.latency_ms)}",
+                          f"turn wait         {stats(self.turn_wait_ms)}",
+                          f"missed turns      {self.missed}"])
+
 class HighScores:
-    def __init__(self):
-        self.scores = []
-        if os.path.exists('highscores.json'):
+    """Top 10 scores overall, per base maze and per level.
+
+    Saving never blocks a frame: add() updates the boards in memory and a
+    background thread appends the entry to highscores.log as one fsynced
+    JSON line. Every COMPACT_EVERY entries, and on close(), the boards are
+    written to highscores.json via a temporary file and os.replace and the
+    log is emptied, so a crash at any point loses at most a torn last line.
+    """
+    SIZE = 10
+    COMPACT_EVERY = 50  # log entries between rewrites of the snapshot
+
+    def __init__(self, path='highscores.json'):
+        self.path = path
+        self.log_path = os.path.splitext(path)[0] + '.log'
+        self.scores = []  # global board
+        self.mazes = {}  # base maze index -> board
+        self.levels = {}  # level -> board
+        self.last = 0  # id of the newest entry
+        self.pending = queue.Queue()
+        self.worker = None
+        self.failed = 0  # writes that hit an OSError; only the first is reported
+        self.load()
+        # The writer thread's copy of the boards, holding only entries that are on disk
+        self.saved = (list(self.scores), {k: list(b) for k, b in self.mazes.items()},
+                      {k: list(b) for k, b in self.levels.items()})
+        self.saved_last = self.last
+        self.high = self.scores[0]['score'] if self.scores else 0  # kept in sync by add()
+
+    def load(self):
+        if os.path.exists(self.path):
             try:
-                with open('highscores.json', 'r') as f:
-                    self.scores = json.load(f)
-            except: pass
-    
-    def add(self, initials, score):
-        self.scores.append({'initials': initials, 'score': score})
-        self.scores.sort(key=lambda x: x['score'], reverse=True)
-        self.scores = self.scores[:10]
-        with open('highscores.json', 'w') as f:
-            json.dump(self.scores, f)
-    
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+            except OSError as e:
+                print(f"high scores: {self.path} unreadable ({e})", file=sys.stderr)
+                data = []
+            except ValueError as e:
+                # Only a damaged disk gets here: keep the file for inspection and start over
+                print(f"high scores: {self.path} corrupt ({e}), moved to {self.path}.bad", file=sys.stderr)
+                try:
+                    os.replace(self.path, self.path + '.bad')
+                except OSError:
+                    pass
+                data = []
+            if isinstance(data, list):  # the original format, a bare global board
+                data = {'scores': data}
+            self.scores = data.get('scores', [])
+            self.mazes = {int(k): board for k, board in data.get('mazes', {}).items()}
+            self.levels = {int(k): board for k, board in data.get('levels', {}).items()}
+            self.last = data.get('last', 0)
+        compacted = self.last  # entries up to this id are in the snapshot already
+        self.logged = 0  # entries in the log file
+        self.torn = False  # the log ends in a partial line, left by a crash mid-append
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'r') as f:
+                for line in f:
+                    self.torn = not line.endswith('\n')
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.logged += 1
+                    if entry['id'] > compacted:
+                        self.insert(entry, self.scores, self.mazes, self.levels)
+                        self.last = max(self.last, entry['id'])
+
+    def insert(self, entry, scores, mazes, levels):
+        record = {'initials': entry['initials'], 'score': entry['score'], 'level': entry['level']}
+        for board in (scores, mazes.setdefault(entry['level'] % len(BASE_MAZES), []),
+                      levels.setdefault(entry['level'], [])):
+            board.append(record)
+            board.sort(key=lambda x: x['score'], reverse=True)
+            del board[self.SIZE:]
+
+    def add(self, initials, score, level=0):
+        self.last += 1
+        entry = {'id': self.last, 'initials': initials, 'score': score, 'level': level}
+        self.insert(entry, self.scores, self.mazes, self.levels)
+        self.high = self.scores[0]['score']
+        if self.worker is None:
+            self.worker = threading.Thread(target=self.write_behind, name='openpac-scores', daemon=True)
+            self.worker.start()
+        self.pending.put(entry)
+
+    def board(self, maze=None, level=None):
+        """Global board, or the one of a base maze or a level."""
+        if maze is not None:
+            return self.mazes.get(maze, [])
+        if level is not None:
+            return self.levels.get(level, [])
+        return self.scores
+
+    def write_behind(self):
+        log = None
+        while True:
+            entry = self.pending.get()
+            if entry is None:
+                break
+            try:
+                if log is None:
+                    log = open(self.log_path, 'a')
+                    if self.torn:
+                        log.write('\n')  # don't glue the next entry onto the partial line
+                        self.torn = False
+                log.write(json.dumps(entry) + '\n')
+                log.flush()
+                os.fsync(log.fileno())
+                self.insert(entry, *self.saved)
+                self.saved_last = entry['id']
+                self.logged += 1
+                if self.logged >= self.COMPACT_EVERY:
+                    self.compact(log)
+            except OSError as e:
+                # Disk full, read-only, ...: keep going, later scores may still make it
+                self.write_failed(e)
+                if log is not None:
+                    self.torn = True  # the failed write may have left a partial line
+                    try:
+                        log.close()
+                    except OSError:
+                        pass
+                    log = None
+        if log is not None:
+            try:
+                if self.logged:
+                    self.compact(log)
+                log.close()
+            except OSError as e:
+                self.write_failed(e)
+
+    def write_failed(self, error):
+        if not self.failed:
+            print(f"high scores: saving to {self.log_path} failed: {error}", file=sys.stderr)
+        self.failed += 1
+
+    def compact(self, log):
+        """Atomically replace the snapshot with the logged boards, then empty the log."""
+        scores, mazes, levels = self.saved
+        data = json.dumps({'version': 2, 'last': self.saved_last, 'scores': scores,
+                           'mazes': mazes, 'levels': levels})
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        try:  # make the rename itself durable (POSIX only)
+            fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        except OSError:
+            pass
+        log.truncate(0)
+        self.logged = 0
+
+    def close(self):
+        """Finish pending writes; called on exit."""
+        if self.worker is not None:
+            self.pending.put(None)
+            self.worker.join()
+            self.worker = None
+
     def get_high(self):
-        return self.scores[0]['score'] if self.scores else 0
+        return self.high
+
+class Assets:
+    """Process-wide sprite cache: every image is decoded, converted and scaled once.
+
+    Player, Ghost and the fruit system all get shared references to the same
+    surfaces, so new levels and respawns don't touch the disk. Files named in
+    prefetch() are decoded on a background thread ahead of their first use.
+    Use Assets.shared() instead of creating instances.
+    """
+    _shared = None
+
+    def __init__(self, assets_dir):
+        self.assets_dir = assets_dir
+        self.cache = {}
+        self.sprite_size = (TILE-4, TILE-4)  # default image size; the front end scales it with its tile size
+        self.decoded = {}  # file name -> [Event set once decoded, Surface or None], from prefetch()
+
+    @classmethod
+    def shared(cls, assets_dir=None):
+        if cls._shared is None:
+            cls._shared = cls(assets_dir or os.path.dirname(os.path.abspath(__file__)))
+        return cls._shared
+
+    def image(self, name, size=()):
+        """Return the image `name` scaled to `size` (default sprite_size, None keeps it as is), or None if it can't be loaded."""
+        if size == ():
+            size = self.sprite_size
+        key = (name, size)
+        if key not in self.cache:
+            try:
+                img = self.load(name).convert_alpha()
+                if size:
+                    img = pygame.transform.smoothscale(img, size)
+            except Exception:
+                img = None
+            self.cache[key] = img
+        return self.cache[key]
+
+    def prefetch(self, *names):
+        """Queue image files for decoding on a background thread, in order."""
+        entries = [(name, self.decoded.setdefault(name, [threading.Event(), None]))
+                   for name in names if name not in self.decoded]
+        if entries:
+            threading.Thread(target=self.decode_files, args=(entries,), name='openpac-images', daemon=True).start()
+
+    def decode_files(self, entries):
+        # pygame releases the GIL while decoding, so the frame loop keeps running
+        for name, entry in entries:
+            try:
+                entry[1] = pygame.image.load(os.path.join(self.assets_dir, name))
+            except Exception:
+                pass
+            entry[0].set()
+
+    def load(self, name):
+        """The decoded file `name`, taken from prefetch() if it was queued there."""
+        entry = self.decoded.pop(name, None)
+        if entry is not None:
+            entry[0].wait()  # usually long done
+            if entry[1] is not None:
+                return entry[1]
+        return pygame.image.load(os.path.join(self.assets_dir, name))
+
+    def player_frames(self):
+        """Both Pac-Man animation frames for each direction, or None without sprites."""
+        key = ('player_frames', self.sprite_size)
+        if key not in self.cache:
+            frames = None
+            base_img1 = self.image('thepac.png')
+            if base_img1:
+                base_img2 = self.image('thepac2.png') or base_img1  # fallback to same image
+                # Create rotated versions for each direction for both frames
+                frames = {
+                    'right': [base_img1, base_img2],
+                    'left': [pygame.transform.flip(base_img1, True, False),
+                             pygame.transform.flip(base_img2, True, False)],
+                    'up': [pygame.transform.rotate(base_img1, 90),
+                           pygame.transform.rotate(base_img2, 90)],
+                    'down': [pygame.transform.rotate(base_img1, -90),
+                             pygame.transform.rotate(base_img2, -90)],
+                }
+            self.cache[key] = frames
+        return self.cache[key]
+
+    def ghost_sprites(self, idx):
+        """(normal, frightened) images of ghost `idx`, or None without sprites."""
+        key = ('ghost_sprites', idx % 5, self.sprite_size)
+        if key not in self.cache:
+            sprites = None
+            img = self.image(f'ghost{idx % 5 + 1}.png')
+            if img:
+                # Create a blue/inverted "frightened" version of the ghost image
+                fright_img = img.copy()
+                w, h = fright_img.get_size()
+                for px in range(w):
+                    for py in range(h):
+                        r, g, b, a = fright_img.get_at((px, py))
+                        # Convert to grayscale then tint blue
+                        gray = int(0.3 * r + 0.59 * g + 0.11 * b)
+                        fright_img.set_at((px, py), (max(0, gray - 50), max(0, gray - 50), min(255, gray + 100), a))
+                sprites = (img, fright_img)
+            self.cache[key] = sprites
+        return self.cache[key]
+
+class TextCache:
+    """LRU cache of rendered text surfaces keyed by (font, text, color).
+
+    Bounded by the total pixel memory of the cached surfaces, so a stream of
+    one-off strings can't grow it without limit.
+    """
+    def __init__(self, max_bytes=2 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()  # key -> (surface, bytes), least recently used first
+        self.bytes = 0
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            return entry[0]
+        surface = font.render(text, True, color).convert_alpha()
+        size = surface.get_width() * surface.get_height() * surface.get_bytesize()
+        self.entries[key] = (surface, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.bytes -= evicted
+        return surface
+
+
+class StartupTimeline:
+    """Milestones of the startup pipeline, in ms since this module started loading."""
+    def __init__(self, t0=STARTUP_T0):
+        self.t0 = t0
+        self.marks = []
+
+    def mark(self, label):
+        """Record a milestone and return its time in ms."""
+        ms = (time.perf_counter() - self.t0) * 1000
+        self.marks.append((label, ms))
+        return ms
+
+    def report(self):
+        lines = ["startup timeline:"]
+        prev = 0.0
+        for label, ms in self.marks:
+            lines.append(f"  {ms:8.1f} ms  (+{ms - prev:6.1f})  {label}")
+            prev = ms
+        return "\n".join(lines)
+
+
+class StartupBudgetExceeded(RuntimeError):
+    pass
+
+
+class Profiler:
+    """Timings of the phases of each frame, kept in a fixed-size ring buffer.
+
+    Phases are timed back to back: `t = prof.lap('phase', t)` records the time
+    since `t` and returns the start of the next phase. The last few seconds can
+    be shown as an overlay (F11) or exported as a Chrome trace (F10, --trace).
+    """
+    BUDGET_MS = 1000.0 / FPS
+
+    def __init__(self, capacity=16384, enabled=True):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.names = [None] * capacity
+        self.starts = [0.0] * capacity
+        self.durations = [0.0] * capacity
+        self.frames = [0] * capacity
+        self.pos = 0  # total samples recorded; the buffer keeps the last `capacity`
+        self.frame = 0
+        self.t0 = time.perf_counter()
+
+    now = staticmethod(time.perf_counter)
+
+    def lap(self, name, start):
+        now = time.perf_counter()
+        if self.enabled:
+            i = self.pos % self.capacity
+            self.names[i] = name
+            self.starts[i] = start
+            self.durations[i] = now - start
+            self.frames[i] = self.frame
+            self.pos += 1
+        return now
+
+    def next_frame(self):
+        self.frame += 1
+
+    def samples(self):
+        """(frame, name, start, duration) of everything still in the buffer, oldest first."""
+        for n in range(max(0, self.pos - self.capacity), self.pos):
+            i = n % self.capacity
+            yield self.frames[i], self.names[i], self.starts[i], self.durations[i]
+
+    def summary(self, frames=FPS):
+        """Per-phase (name, avg ms, max ms) per frame over the last `frames` complete
+        frames, worst first, and the (avg, max) total frame time."""
+        first = self.frame - frames
+        per_frame = {}
+        # Walk back from the newest sample and stop at the window, not the whole buffer
+        for n in range(self.pos - 1, max(0, self.pos - self.capacity) - 1, -1):
+            i = n % self.capacity
+            frame = self.frames[i]
+            if frame < first:
+                break
+            if frame < self.frame:
+                phases = per_frame.setdefault(frame, {})
+                phases[self.names[i]] = phases.get(self.names[i], 0.0) + self.durations[i] * 1000
+        if not per_frame:
+            return [], (0.0, 0.0)
+        totals = {}
+        worst = {}
+        for phases in per_frame.values():
+            for name, ms in phases.items():
+                totals[name] = totals.get(name, 0.0) + ms
+                worst[name] = max(worst.get(name, 0.0), ms)
+        count = len(per_frame)
+        rows = sorted(((name, totals[name] / count, worst[name]) for name in totals), key=lambda r: -r[2])
+        frame_ms = [sum(phases.values()) for phases in per_frame.values()]
+        return rows, (sum(frame_ms) / count, max(frame_ms))
+
+    def export_trace(self, path):
+        """Write the buffer as Chrome trace JSON (open in chrome://tracing or Perfetto)."""
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': 1, 'args': {'name': 'openpac'}}]
+        for frame, name, start, duration in self.samples():
+            events.append({'name': name, 'ph': 'X', 'pid': 1, 'tid': 1,
+                           'ts': round((start - self.t0) * 1e6, 1), 'dur': round(duration * 1e6, 1),
+                           'args': {'frame': frame}})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+class Audio:
+    """Music and sound effects for the front end.
+
+    Long looping tracks (the intro and the power pellet loop) are streamed from
+    disk through pygame.mixer.music instead of being decoded into memory. Short
+    effects are decoded on a background thread; playing one that isn't ready
+    yet is skipped rather than stalling the frame.
+    """
+    MUSIC = {'intro': ['intro.mp3'], 'power': ['powerpellet.mp3', 'power.mp3']}
+    EFFECTS = {'chomp': ('chomp.mp3', 1.3), 'eatghost': ('ghosteatin.mp3', 1.0), 'death': ('pacman_death.mp3', 1.0)}
+
+    def __init__(self, assets_dir):
+        self.assets_dir = assets_dir
+        self.enabled = False  # becomes True once start() has opened the mixer
+        self.sounds = {}  # effect name -> decoded Sound, or None if it failed to load
+        self.requested = set()
+        self.pending = queue.Queue()
+        self.worker = None
+        self.current_music = None
+
+    def start(self):
+        """Open the mixer, start any music requested so far and begin decoding queued effects."""
+        if self.worker is not None:
+            return
+        try:
+            pygame.mixer.init()
+            self.enabled = True
+        except Exception:
+            return
+        if self.current_music:
+            self.play_music(self.current_music)
+        self.worker = threading.Thread(target=self.decode_effects, name='openpac-audio', daemon=True)
+        self.worker.start()
+
+    def preload(self, *names):
+        """Queue effects for background decoding."""
+        for name in names:
+            if name not in self.requested:
+                self.requested.add(name)
+                self.pending.put(name)
+
+    def decode_effects(self):
+        while True:
+            name = self.pending.get()
+            filename, volume = self.EFFECTS[name]
+            try:
+                sound = pygame.mixer.Sound(os.path.join(self.assets_dir, filename))
+                sound.set_volume(volume)
+            except Exception:
+                sound = None
+            self.sounds[name] = sound
+
+    def play(self, name):
+        sound = self.sounds.get(name)
+        if sound is None:
+            self.preload(name)  # first use: decode it in the background
+            return
+        try:
+            sound.play()
+        except Exception:
+            pass
+
+    def play_music(self, track):
+        """Stream `track` in a loop, replacing whatever music was playing."""
+        self.current_music = track  # remembered so start() can pick it up
+        if not self.enabled:
+            return
+        for filename in self.MUSIC[track]:
+            path = os.path.join(self.assets_dir, filename)
+            if os.path.exists(path):
+                try:
+                    pygame.mixer.music.load(path)
+                    pygame.mixer.music.play(-1)
+                except Exception:
+                    pass
+                return
+
+    def stop_music(self, track=None):
+        """Stop the music, or only `track` when that is the one playing."""
+        if track is not None and track != self.current_music:
+            return
+        self.current_music = None
+        if not self.enabled:
+            return
+        try:
+            pygame.mixer.music.stop()
+        except Exception:
+            pass
+
+    def decoded_bytes(self):
+        """Approximate PCM memory held by each decoded effect."""
+        init = pygame.mixer.get_init() if self.enabled else None
+        if not init:
+            return {}
+        freq, fmt, channels = init
+        frame_size = channels * abs(fmt) // 8
+        return {name: int(sound.get_length() * freq) * frame_size
+                for name, sound in list(self.sounds.items()) if sound}
+
+    def memory_report(self):
+        sizes = self.decoded_bytes()
+        lines = [f"{name:10s} {size / 1024:8.0f} KB" for name, size in sorted(sizes.items())]
+        lines.append(f"{'total':10s} {sum(sizes.values()) / 1024:8.0f} KB decoded (music is streamed)")
+        return "\n".join(lines)
+
+class FrameCapture:
+    """Records presented frames without stalling the game loop.
+
+    add() only copies the screen's pixels into a free buffer from a fixed
+    pool and queues it; a background thread writes the frames out and hands
+    the buffers back. With no free buffer left the frame is dropped (policy
+    'drop', counted in `dropped`) or add() waits for one (policy 'block').
+
+    'raw' appends every frame's pixels to one file, described by PATH.json;
+    'png' writes PATH/frame-000000.png, PATH/frame-000001.png, ...
+    """
+    FORMATS = ('raw', 'png')
+    POLICIES = ('drop', 'block')
+
+    def __init__(self, path, surface, fmt='raw', policy='drop', buffers=8):
+        if fmt not in self.FORMATS or policy not in self.POLICIES:
+            raise ValueError(f"unknown capture format {fmt!r} or policy {policy!r}")
+        self.path = path
+        self.fmt = fmt
+        self.policy = policy
+        self.size = surface.get_size()
+        # Frames are kept as 32-bit pixels; other screen depths go through a converted copy
+        self.staging = None if surface.get_bitsize() == 32 else pygame.Surface(self.size, 0, 32)
+        sample = self.staging or surface
+        self.pitch = sample.get_pitch()
+        self.pixel_format = self.byte_order(sample)
+        self.free = queue.Queue()
+        for _ in range(buffers):
+            self.free.put(bytearray(self.pitch * self.size[1]))
+        self.frames = queue.Queue()  # (index, buffer), None to stop; never holds more than `buffers`
+        self.captured = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        if fmt == 'raw':
+            self.out = open(path, 'wb')
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.out = None
+        self.worker = threading.Thread(target=self.write_frames, name='openpac-capture', daemon=True)
+        self.worker.start()
+
+    @staticmethod
+    def byte_order(surface):
+        """Channel order of a 32-bit surface's bytes in memory, e.g. 'BGRX' (X = unused byte)."""
+        channels = {shift: name for shift, mask, name in zip(surface.get_shifts(), surface.get_masks(), 'RGBA') if mask}
+        order = ''.join(channels.get(8 * i, 'X') for i in range(4))
+        return order if sys.byteorder == 'little' else order[::-1]
+
+    def add(self, surface):
+        try:
+            buf = self.free.get(block=self.policy == 'block')
+        except queue.Empty:
+            self.dropped += 1
+            return
+        if self.staging is not None:
+            self.staging.blit(surface, (0, 0))
+            surface = self.staging
+        memoryview(buf)[:] = surface.get_buffer()
+        self.frames.put((self.captured, buf))
+        self.captured += 1
+
+    def write_frames(self):
+        while True:
+            item = self.frames.get()
+            if item is None:
+                return
+            index, buf = item
+            try:
+                if self.out is not None:
+                    self.out.write(buf)
+                else:
+                    with open(os.path.join(self.path, f"frame-{index:06d}.png"), 'wb') as f:
+                        f.write(self.encode_png(buf))
+                self.written += 1
+            except Exception as e:
+                if not self.failed:
+                    print(f"frame capture failed: {e}", file=sys.stderr)
+                self.failed += 1
+            self.free.put(buf)
+
+    def encode_png(self, buf):
+        """PNG file of one captured frame.
+
+        Written by hand rather than with pygame.image.save, which holds the GIL
+        for the whole encode; zlib releases it, so the game keeps running.
+        """
+        width, height = self.size
+        rgb = bytearray(width * height * 3)
+        for i, channel in enumerate('RGB'):  # 32-bit rows are never padded, so pitch == width * 4
+            rgb[i::3] = buf[self.pixel_format.index(channel)::4]
+        stride = width * 3
+        rows = b''.join(b'\0' + rgb[y * stride:(y + 1) * stride] for y in range(height))  # filter 0 per row
+
+        def chunk(kind, data):
+            return len(data).to_bytes(4, 'big') + kind + data + zlib.crc32(kind + data).to_bytes(4, 'big')
+        header = width.to_bytes(4, 'big') + height.to_bytes(4, 'big') + bytes([8, 2, 0, 0, 0])  # 8-bit RGB
+        return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) +
+                chunk(b'IDAT', zlib.compress(rows, 1)) + chunk(b'IEND', b''))
+
+    def close(self):
+        """Write out the queued frames and stop the worker."""
+        self.frames.put(None)
+        self.worker.join()
+        if self.out is not None:
+            self.out.close()
+            with open(self.path + '.json', 'w') as f:
+                json.dump({'width': self.size[0], 'height': self.size[1], 'pitch': self.pitch,
+                           'format': self.pixel_format, 'fps': FPS, 'frames': self.written}, f, indent=2)
+        return f"{self.written} frames captured to {self.path}, {self.dropped} dropped"
 
 ## Base maze templates - classic Pac-Man style corridors
 ## These provide the fundamental corridor structure, then we modify details per level
@@ -215,31 +951,28 @@ def generate_maze(level):
     
     # Ensure critical paths are always open
     # Ghost house door
-    maze[12][13] = '-'
-    maze[12][14] = '-'
+    for x in HOUSE_DOOR_COLS:
+        maze[HOUSE_TOP][x] = '-'
     
     # Ghost house interior
-    for y in range(13, 16):
-        for x in range(11, 17):
+    for y in range(HOUSE_TOP + 1, HOUSE_BOTTOM):
+        for x in range(HOUSE_LEFT + 1, HOUSE_RIGHT):
             maze[y][x] = ' '
-        maze[y][10] = '#'
-        maze[y][17] = '#'
-    maze[16][10:18] = list('########')
+        maze[y][HOUSE_LEFT] = '#'
+        maze[y][HOUSE_RIGHT] = '#'
+    for x in range(HOUSE_LEFT, HOUSE_RIGHT + 1):
+        maze[HOUSE_BOTTOM][x] = '#'
     
     # Tunnel row
-    for x in range(0, 6):
-        maze[14][x] = 'T'
-    for x in range(22, 28):
-        maze[14][x] = 'T'
+    for x in range(0, TUNNEL_LENGTH):
+        maze[TUNNEL_ROW][x] = 'T'
+    for x in range(WIDTH - TUNNEL_LENGTH, WIDTH):
+        maze[TUNNEL_ROW][x] = 'T'
     # Path to tunnels
-    maze[14][6] = '.'
-    maze[14][7] = '.'
-    maze[14][8] = '.'
-    maze[14][9] = '.'
-    maze[14][18] = '.'
-    maze[14][19] = '.'
-    maze[14][20] = '.'
-    maze[14][21] = '.'
+    for x in range(TUNNEL_LENGTH, HOUSE_LEFT):
+        maze[TUNNEL_ROW][x] = '.'
+    for x in range(HOUSE_RIGHT + 1, WIDTH - TUNNEL_LENGTH):
+        maze[TUNNEL_ROW][x] = '.'
     
     # Spawn area must be clear
     for x in range(11, 17):
@@ -253,17 +986,376 @@ def generate_maze(level):
     return [''.join(row) for row in maze]
 
 
+class PelletIndex:
+    """The pellets left in a level, as one bit per tile over a shared MazeTemplate.
+
+    The template knows where pellets start and which are power pellets, so a
+    game only owns `bits` (about 110 bytes for the 28x31 maze): resetting or
+    snapshotting a level is a tiny copy. `remaining` is the pellets left.
+    """
+    def __init__(self, template, bits=None):
+        self.template = template
+        self.width = template.tiles.width
+        self.height = template.tiles.height
+        self.bits = bytearray(template.pellet_bits if bits is None else bits)
+        self.total = template.pellet_count
+        self.remaining = sum(bin(byte).count('1') for byte in self.bits)
+
+    def __len__(self):
+        return self.remaining
+
+    def __contains__(self, pos):
+        x, y = pos
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        i = y * self.width + x
+        return bool(self.bits[i >> 3] & (1 << (i & 7)))
+
+    @property
+    def dots(self):
+        """(x, y) of every regular pellet still in the maze."""
+        return [pos for pos in self.template.dot_tiles if pos in self]
+
+    @property
+    def power(self):
+        """(x, y) of every power pellet still in the maze."""
+        return [pos for pos in self.template.power_tiles if pos in self]
+
+    def eat(self, x, y):
+        """Remove the pellet at (x, y) and return its cell ('.' or 'o'), or None if there is none."""
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        i = y * self.width + x
+        bit = 1 << (i & 7)
+        if not self.bits[i >> 3] & bit:
+            return None
+        self.bits[i >> 3] ^= bit
+        self.remaining -= 1
+        return 'o' if self.template.tiles.attrs[i] & TILE_POWER else '.'
+
+    def snapshot(self):
+        return bytes(self.bits)
+
+    def restore(self, bits):
+        self.bits[:] = bits
+        self.remaining = sum(bin(byte).count('1') for byte in self.bits)
+
+
+# Tile attribute bits of a TileMap
+TILE_WALL = 1
+TILE_DOOR = 2
+TILE_TUNNEL = 4
+TILE_SLOW = 8  # ghosts move at half speed
+TILE_HOUSE = 16  # active ghosts may not enter
+TILE_PELLET = 32
+TILE_POWER = 64
+TILE_CODES = {'#': TILE_WALL, '-': TILE_DOOR, 'T': TILE_TUNNEL, '.': TILE_PELLET, 'o': TILE_POWER}
+
+
+class TileMap:
+    """A maze layout compiled into one read-only attribute byte per tile (TILE_* bits).
+
+    All collision and zone checks are bit tests against this map instead of
+    character comparisons and coordinate ranges. The pellet bits mark where
+    pellets start; which are left is tracked per game by PelletIndex.
+    """
+    def __init__(self, maze):
+        self.width = len(maze[0])
+        self.height = len(maze)
+        attrs = bytearray(self.width * self.height)
+        for y, row in enumerate(maze):
+            for x, cell in enumerate(row):
+                attr = TILE_CODES.get(cell, 0)
+                if x < TUNNEL_LENGTH or x >= self.width - TUNNEL_LENGTH:
+                    attr |= TILE_SLOW
+                if HOUSE_TOP <= y <= HOUSE_BOTTOM and HOUSE_LEFT <= x <= HOUSE_RIGHT:
+                    attr |= TILE_HOUSE
+                attrs[y * self.width + x] = attr
+        self.attrs = bytes(attrs)
+
+    def at(self, tx, ty):
+        """Attributes of tile (tx, ty); off the sides is the tunnel, above or below is wall."""
+        if not 0 <= tx < self.width:
+            return TILE_TUNNEL | TILE_SLOW
+        if not 0 <= ty < self.height:
+            return TILE_WALL
+        return self.attrs[ty * self.width + tx]
+
+
+# Exit bits used by NavTable, and the directions each bitmask allows
+DIR_BITS = {(0, -1): 1, (0, 1): 2, (-1, 0): 4, (1, 0): 8}
+EXIT_DIRS = [[d for d in [(0,-1), (0,1), (-1,0), (1,0)] if mask & DIR_BITS[d]] for mask in range(16)]
+
+
+class NavTable:
+    """Legal exits of every tile of a maze as DIR_BITS masks, built once per level.
+
+    Columns wrap around, so the two tunnel ends lead into each other. Ghost
+    exits also exclude the ghost house, which active ghosts may not re-enter.
+    """
+    def __init__(self, tiles):
+        self.width = tiles.width
+        self.height = tiles.height
+        self.player = bytearray(self.width * self.height)
+        self.ghost = bytearray(self.width * self.height)
+        for y in range(self.height):
+            for x in range(self.width):
+                player_mask = ghost_mask = 0
+                for d, bit in DIR_BITS.items():
+                    attr = tiles.at((x + d[0]) % self.width, y + d[1])
+                    if attr & TILE_WALL:
+                        continue
+                    player_mask |= bit
+                    if not attr & TILE_HOUSE:
+                        ghost_mask |= bit
+                self.player[y * self.width + x] = player_mask
+                self.ghost[y * self.width + x] = ghost_mask
+
+    def player_exits(self, tx, ty):
+        return self.player[ty * self.width + tx % self.width]
+
+    def ghost_exits(self, tx, ty):
+        return self.ghost[ty * self.width + tx % self.width]
+
+
+class PathTable:
+    """Shortest ghost path length between every pair of tiles of a maze.
+
+    Built by a BFS from every tile over the NavTable ghost exits (so it knows
+    about the tunnel wrap and the one-way ghost house) and cached on disk by a
+    hash of that graph, so a maze is only searched once per machine. A lookup
+    is one index into a flat bytearray.
+    """
+    VERSION = 1
+    UNREACHABLE = 255
+    _loaded = {}  # graph hash -> distance bytes, shared by every level using that maze
+
+    def __init__(self, tiles, nav, cache_dir=None):
+        if cache_dir is None:  # looked up now, not at import, so tests can redirect it
+            cache_dir = os.environ.get('OPENPAC_CACHE', PATH_CACHE_DIR)
+        self.width = w = nav.width
+        self.height = nav.height
+        self.size = n = w * self.height
+        key = hashlib.sha1(b'%d/%d/%d/' % (self.VERSION, w, self.height) + bytes(nav.ghost)).hexdigest()
+        self.dist = self._loaded.get(key)
+        if self.dist is None:
+            path = os.path.join(cache_dir, f"paths-{key}.bin") if cache_dir else None
+            self.dist = self.load(path, n * n) or self.build(nav)
+            if path and not os.path.exists(path):
+                self.save(path, self.dist)
+            self._loaded[key] = self.dist
+        self.snap = self.build_snap(tiles)
+
+    @staticmethod
+    def load(path, length):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            return data if len(data) == length else None
+        except (OSError, TypeError):
+            return None
+
+    @staticmethod
+    def save(path, data):
+        # Best effort, written to a temp file first so a crash never leaves a torn cache
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def build(self, nav):
+        w, n = self.width, self.size
+        neighbours = []
+        for i in range(n):
+            x, y = i % w, i // w
+            neighbours.append([((y + d[1]) * w + (x + d[0]) % w) for d in EXIT_DIRS[nav.ghost[i]]])
+        dist = bytearray([self.UNREACHABLE]) * (n * n)
+        for source in range(n):
+            if not neighbours[source]:
+                continue  # wall (or a dead end nothing can leave)
+            row = source * n
+            dist[row + source] = 0
+            frontier = [source]
+            steps = 0
+            while frontier:
+                steps = min(steps + 1, self.UNREACHABLE - 1)
+                reached = []
+                for tile in frontier:
+                    for nb in neighbours[tile]:
+                        if dist[row + nb] == self.UNREACHABLE:
+                            dist[row + nb] = steps
+                            reached.append(nb)
+                frontier = reached
+        return bytes(dist)
+
+    def build_snap(self, tiles):
+        """Nearest tile a roaming ghost can reach, for targets in walls, the house or closed-off space."""
+        w, n = self.width, self.size
+        # Roaming ghosts live in the part of the maze connected to the corridor above the door
+        exit_tile = (HOUSE_EXIT_Y // TILE) * w + HOUSE_DOOR_COLS[0]
+        snap = [-1] * n
+        frontier = [i for i in range(n) if not tiles.attrs[i] & (TILE_WALL | TILE_HOUSE)
+                    and self.distance(exit_tile, i) != self.UNREACHABLE
+                    and self.distance(i, exit_tile) != self.UNREACHABLE]
+        for i in frontier:
+            snap[i] = i
+        while frontier:
+            reached = []
+            for i in frontier:
+                x, y = i % w, i // w
+                for nx, ny in ((x, y - 1), (x - 1, y), (x + 1, y), (x, y + 1)):
+                    if 0 <= nx < w and 0 <= ny < self.height and snap[ny * w + nx] < 0:
+                        snap[ny * w + nx] = snap[i]
+                        reached.append(ny * w + nx)
+            frontier = reached
+        return snap
+
+    def tile(self, tx, ty):
+        """Index of the reachable tile closest to (tx, ty), which may be off the grid."""
+        if not 0 <= tx < self.width:
+            tx = 0 if tx < 0 else self.width - 1
+        if not 0 <= ty < self.height:
+            ty = 0 if ty < 0 else self.height - 1
+        return self.snap[ty * self.width + tx]
+
+    def distance(self, a, b):
+        return self.dist[a * self.size + b]
+
+    def step_toward(self, tx, ty, dirs, target):
+        """The direction in `dirs` from tile (tx, ty) that is on a shortest path to `target`."""
+        best, best_dist = dirs[0], self.UNREACHABLE + 1
+        w, n, dist = self.width, self.size, self.dist
+        for d in dirs:
+            steps = dist[((ty + d[1]) * w + (tx + d[0]) % w) * n + target]
+            if steps < best_dist:
+                best, best_dist = d, steps
+        return best
+
+
+class MazeTemplate:
+    """Everything about a maze layout that never changes during play.
+
+    Rows, tile attributes, navigation and path tables are built once per
+    layout and shared by every level and every Simulation that plays it; a
+    game's only per-level maze state is its PelletIndex.
+    """
+    _shared = {}  # rows -> MazeTemplate
+    _levels = {}  # level -> MazeTemplate, so a level reset doesn't regenerate the maze
+    _lock = threading.Lock()  # for_level may run on the path thread too
+
+    def __init__(self, rows):
+        self.rows = tuple(rows)  # strings, indexable as maze[y][x]
+        self.tiles = TileMap(self.rows)
+        self.nav = NavTable(self.tiles)
+        self._paths = None  # PathTable, built on first use (see paths)
+        self._paths_lock = threading.Lock()  # one build, even when a background thread prepares it
+        self.dot_tiles = tuple((x, y) for y, row in enumerate(self.rows) for x, cell in enumerate(row) if cell == '.')
+        self.power_tiles = tuple((x, y) for y, row in enumerate(self.rows) for x, cell in enumerate(row) if cell == 'o')
+        bits = bytearray((self.tiles.width * self.tiles.height + 7) // 8)
+        for x, y in self.dot_tiles + self.power_tiles:
+            i = y * self.tiles.width + x
+            bits[i >> 3] |= 1 << (i & 7)
+        self.pellet_bits = bytes(bits)
+        self.pellet_count = len(self.dot_tiles) + len(self.power_tiles)
+
+    @property
+    def paths(self):
+        """The layout's PathTable; the first use may run the all-pairs BFS (see prepare_paths)."""
+        if self._paths is None:
+            with self._paths_lock:
+                if self._paths is None:
+                    self._paths = PathTable(self.tiles, self.nav)
+        return self._paths
+
+    @classmethod
+    def for_level(cls, level):
+        with cls._lock:
+            template = cls._levels.get(level)
+            if template is None:
+                rows = tuple(generate_maze(level))
+                template = cls._shared.get(rows)
+                if template is None:
+                    template = cls._shared[rows] = cls(rows)
+                cls._levels[level] = template
+            return template
+
+    @classmethod
+    def prepare_paths(cls):
+        """Build (or load) the PathTable of every base maze, so no level builds one mid-play."""
+        for level in range(len(BASE_MAZES)):
+            cls.for_level(level).paths
+
+
+class SpatialHash:
+    """Entities bucketed by the tile they are on, for collision broadphase.
+
+    Every collision radius is under one tile, so anything that can touch a
+    point is on that point's tile or one of its eight neighbours.
+    """
+    def __init__(self):
+        self.cells = {}  # (tx, ty) -> set of items
+        self.where = {}  # item -> (tx, ty)
+
+    def move(self, item, x, y):
+        """Insert `item` at pixel position (x, y), or move it there."""
+        cell = (int(x // TILE), int(y // TILE))
+        old = self.where.get(item)
+        if old == cell:
+            return
+        if old is not None:
+            self.cells[old].discard(item)
+        self.cells.setdefault(cell, set()).add(item)
+        self.where[item] = cell
+
+    def remove(self, item):
+        cell = self.where.pop(item, None)
+        if cell is not None:
+            self.cells[cell].discard(item)
+
+    def near(self, x, y):
+        """Items on the tile under (x, y) and the eight around it."""
+        tx, ty = int(x // TILE), int(y // TILE)
+        found = []
+        for cy in (ty - 1, ty, ty + 1):
+            for cx in (tx - 1, tx, tx + 1):
+                bucket = self.cells.get((cx, cy))
+                if bucket:
+                    found.extend(bucket)
+        return found
+
+
+def within(ax, ay, bx, by, radius):
+    """True if the points are closer than `radius` (squared compare, no sqrt)."""
+    dx = ax - bx
+    dy = ay - by
+    return dx * dx + dy * dy < radius * radius
+
+
+def interpolate(entity, alpha):
+    """Draw position of `entity`, `alpha` of the way from its previous tick to the current one."""
+    dx = entity.x - entity.prev_x
+    dy = entity.y - entity.prev_y
+    if abs(dx) > TILE or abs(dy) > TILE:
+        return entity.x, entity.y  # teleported (tunnel, respawn, eaten): don't slide across the maze
+    return entity.prev_x + dx * alpha, entity.prev_y + dy * alpha
+
+
 class Player:
-    def __init__(self, x, y, img_path):
+    def __init__(self, x, y, frames=None):
         self.x = x
         self.y = y
+        self.prev_x, self.prev_y = x, y  # position at the previous tick, for interpolation
         self.dir = (0, 0)
         self.next_dir = (0, 0)
         self.speed = 2
         self.base_speed = 2
         self.speed_test = False  # F12 toggle for 5x speed
         self.img = None
-        # Animation frames for each direction
+        # Animation frames for each direction (shared surfaces from Assets.player_frames)
         self.frames_right = []
         self.frames_left = []
         self.frames_up = []
@@ -271,54 +1363,36 @@ class Player:
         self.anim_frame = 0
         self.anim_timer = 0
         self.anim_speed = 8  # frames between animation changes
-        
-        try:
-            # Load both animation frames
-            img_dir = os.path.dirname(img_path)
-            img1 = pygame.image.load(img_path).convert_alpha()
-            base_img1 = pygame.transform.smoothscale(img1, (TILE-4, TILE-4))
-            
-            # Try to load second frame
-            img_path2 = img_path.replace('.png', '2.png').replace('.gif', '2.png')
-            try:
-                img2 = pygame.image.load(img_path2).convert_alpha()
-                base_img2 = pygame.transform.smoothscale(img2, (TILE-4, TILE-4))
-            except:
-                base_img2 = base_img1  # fallback to same image
-            
-            self.img = base_img1
-            # Create rotated versions for each direction for both frames
-            self.frames_right = [base_img1, base_img2]
-            self.frames_left = [pygame.transform.flip(base_img1, True, False),
-                               pygame.transform.flip(base_img2, True, False)]
-            self.frames_up = [pygame.transform.rotate(base_img1, 90),
-                             pygame.transform.rotate(base_img2, 90)]
-            self.frames_down = [pygame.transform.rotate(base_img1, -90),
-                               pygame.transform.rotate(base_img2, -90)]
-        except Exception as e:
-            self.img = None
+        if frames:
+            self.img = frames['right'][0]
+            self.frames_right = frames['right']
+            self.frames_left = frames['left']
+            self.frames_up = frames['up']
+            self.frames_down = frames['down']
     
-    def update(self, maze):
+    def update(self, tiles, nav):
         tile_center_x = (int(self.x) // TILE) * TILE + TILE // 2
         tile_center_y = (int(self.y) // TILE) * TILE + TILE // 2
         
-        # Try next direction first
-        nx = self.x + self.next_dir[0] * self.speed
-        ny = self.y + self.next_dir[1] * self.speed
-        if not self.collides(nx, ny, maze):
-            # If changing direction, snap to grid ONLY if close to tile center
-            if self.next_dir != self.dir:
-                if self.next_dir[0] != 0:  # Turning to horizontal, snap Y
-                    self.y = tile_center_y
-                else:  # Turning to vertical, snap X
-                    self.x = tile_center_x
-            self.dir = self.next_dir
+        # Try next direction first. Reversing works anywhere; a turn waits in
+        # next_dir until a tile center with an exit that way (or until stopped)
+        d = self.next_dir
+        if d == self.dir or d == (-self.dir[0], -self.dir[1]) or d == (0, 0):
+            if not self.blocked(d, tiles, nav):
+                self.dir = d
+        else:
+            along = self.x - tile_center_x if self.dir[0] else self.y - tile_center_y
+            moving = not self.blocked(self.dir, tiles, nav)
+            if ((abs(along) <= self.speed / 2 or not moving)
+                    and 0 <= tile_center_y // TILE < nav.height
+                    and nav.player_exits(tile_center_x // TILE, tile_center_y // TILE) & DIR_BITS[d]):
+                self.x, self.y = tile_center_x, tile_center_y
+                self.dir = d
         
         # Move current direction
-        nx = self.x + self.dir[0] * self.speed
-        ny = self.y + self.dir[1] * self.speed
-        if not self.collides(nx, ny, maze):
-            self.x, self.y = nx, ny
+        if not self.blocked(self.dir, tiles, nav):
+            self.x += self.dir[0] * self.speed
+            self.y += self.dir[1] * self.speed
         
         # Always keep centered on the perpendicular axis while moving
         # This prevents drifting within the wider tunnel paths
@@ -333,32 +1407,48 @@ class Player:
         elif self.x > SCREEN_WIDTH - TILE//2:
             self.x = -TILE//2 + 1
     
-    def collides(self, x, y, maze):
+    def blocked(self, d, tiles, nav):
+        """True if one step in direction d would run into a wall."""
+        tx, ty = int(self.x // TILE), int(self.y // TILE)
+        if 0 <= ty < nav.height:
+            # While the hitbox stays in this tile's row (or column) the step is
+            # either still inside the tile or enters the neighbour ahead, which
+            # the nav table already knows about
+            if d[0]:
+                lane = int((self.y - 7) // TILE) == ty == int((self.y + 7) // TILE)
+                lead = int((self.x + d[0] * (self.speed + 7)) // TILE) - tx
+            else:
+                lane = int((self.x - 7) // TILE) == tx == int((self.x + 7) // TILE)
+                lead = int((self.y + d[1] * (self.speed + 7)) // TILE) - ty
+            if lane:
+                if lead == 0:
+                    return False
+                if lead == d[0] + d[1]:
+                    return not nav.player_exits(tx, ty) & DIR_BITS[d]
+        # Hitbox straddles tiles: check its corners directly
+        return self.collides(self.x + d[0] * self.speed, self.y + d[1] * self.speed, tiles)
+
+    def collides(self, x, y, tiles):
         # Check if the new position would collide
         # Use 7-pixel offset for a slightly forgiving hitbox
         for dx, dy in [(-7,-7), (7,-7), (-7,7), (7,7)]:
-            tx = int((x + dx) // TILE)
-            ty = int((y + dy) // TILE)
-            # Allow wrapping through tunnel (out of bounds horizontally is OK)
-            if tx < 0 or tx >= len(maze[0]):
-                continue  # Allow horizontal out of bounds (tunnel)
-            if 0 <= ty < len(maze) and 0 <= tx < len(maze[0]):
-                cell = maze[ty][tx]
-                if cell == '#':
-                    return True
-                # T = tunnel, passable
-            elif ty < 0 or ty >= len(maze):
-                return True  # Vertical out of bounds is a wall
+            # Off the sides is the tunnel (passable), above or below is wall
+            if tiles.at(int((x + dx) // TILE), int((y + dy) // TILE)) & TILE_WALL:
+                return True
         return False
     
-    def draw(self, screen):
-        if self.img and self.frames_right:
-            # Update animation timer
+    def animate(self):
+        """Advance the chomp animation by one tick."""
+        if self.frames_right:
             self.anim_timer += 1
             if self.anim_timer >= self.anim_speed:
                 self.anim_timer = 0
                 self.anim_frame = (self.anim_frame + 1) % len(self.frames_right)
-            
+
+    def draw(self, screen, alpha=1.0, scale=1.0):
+        """Draw at `scale` screen pixels per game pixel; returns the rect drawn to."""
+        x, y = interpolate(self, alpha)
+        if self.img and self.frames_right:
             # Choose frame list based on direction
             if self.dir == (1, 0):  # right
                 frames = self.frames_right
@@ -372,14 +1462,15 @@ class Player:
                 frames = self.frames_right  # default
             
             img_to_draw = frames[self.anim_frame] if frames else self.img
-            screen.blit(img_to_draw, (self.x-TILE//2+2, self.y-TILE//2+2))
-        else:
-            pygame.draw.circle(screen, YELLOW, (int(self.x), int(self.y)), TILE//2-2)
+            return screen.blit(img_to_draw, ((x-TILE//2+2) * scale, (y-TILE//2+2) * scale))
+        return pygame.draw.circle(screen, YELLOW, (int(x * scale), int(y * scale)), int((TILE//2-2) * scale))
 
 class Ghost:
-    def __init__(self, x, y, img_path, idx):
+    def __init__(self, x, y, sprites, idx, rng=random):
+        self.rng = rng  # random stream for this ghost's choices (the owning Simulation's)
         self.x = x
         self.y = y
+        self.prev_x, self.prev_y = x, y  # position at the previous tick, for interpolation
         self.dir = (0, -1)  # Start moving up toward the door
         self.speed = 1.5
         self.idx = idx
@@ -390,41 +1481,19 @@ class Ghost:
         self.frightened_timer = 0
         self.eaten = False
         self.base_speed = self.speed
-        self.frightened_img = None
-        try:
-            img = pygame.image.load(img_path).convert_alpha()
-            self.img = pygame.transform.smoothscale(img, (TILE-4, TILE-4))
-            # Create a blue/inverted "frightened" version of the ghost image
-            try:
-                fright_img = self.img.copy()
-                # Apply blue tint by manipulating pixels
-                w, h = fright_img.get_size()
-                for px in range(w):
-                    for py in range(h):
-                        r, g, b, a = fright_img.get_at((px, py))
-                        # Convert to grayscale then tint blue
-                        gray = int(0.3 * r + 0.59 * g + 0.11 * b)
-                        fright_img.set_at((px, py), (max(0, gray - 50), max(0, gray - 50), min(255, gray + 100), a))
-                self.frightened_img = fright_img
-            except Exception:
-                pass
-        except Exception as e:
-            colors = [(255,0,0), (255,184,255), (0,255,255), (255,184,82), (0,255,0)]
-            self.img = None
-            self.color = colors[idx % 5]
-        # ensure a base color is always available (even if image loaded)
-        try:
-            colors
-        except NameError:
-            colors = [(255,0,0), (255,184,255), (0,255,255), (255,184,82), (0,255,0)]
-        if not hasattr(self, 'color'):
-            self.color = colors[idx % 5]
+        # (normal, frightened) surfaces from Assets.ghost_sprites; None draws colored circles
+        self.img, self.frightened_img = sprites if sprites else (None, None)
+        self.color = GHOST_COLORS[idx % 5]
         self.base_color = self.color
+        self.profile_name = f"ghost{idx}.update"  # Profiler phase
+        self.strategy = GHOST_STRATEGIES[idx % 5]  # how Simulation.ghost_targets picks its target
     
-    def update(self, maze, player_pos):
+    def update(self, tiles, nav, paths, target_for):
+        """Advance one tick. At each junction a roaming ghost takes the shortest
+        path toward the tile index `target_for(self)` returns."""
         # Safety check: if ghost is inside house but in active/frightened mode, switch to leaving
         tx, ty = int(self.x // TILE), int(self.y // TILE)
-        if self.mode in ('active', 'frightened') and 12 <= ty <= 16 and 10 <= tx <= 17:
+        if self.mode in ('active', 'frightened') and tiles.at(tx, ty) & TILE_HOUSE:
             self.mode = 'leaving'
             
         if self.mode == 'house':
@@ -436,16 +1505,15 @@ class Ghost:
             return
 
         if self.mode == 'leaving':
-            # Move to center of door (between columns 13-14), then up and out
-            # Door is at row 12, columns 13-14 (the '--' tiles)
-            # Row 11 is the open space above the ghost house
-            door_x = TILE * 13 + TILE  # center between cols 13-14 (pixel 448)
-            row_11_center = TILE * 11 + TILE // 2  # center of row 11 (open corridor)
+            # Move to center of door (between its two columns), then up and out
+            # into the open corridor above the ghost house
+            door_x = HOUSE_DOOR_X
+            row_11_center = HOUSE_EXIT_Y
             
-            # Safety: ensure ghost is within house bounds (columns 11-16)
+            # Safety: ensure ghost is within the house interior
             # If somehow outside, snap to door_x
-            house_left = TILE * 11
-            house_right = TILE * 17
+            house_left = TILE * (HOUSE_LEFT + 1)
+            house_right = TILE * HOUSE_RIGHT
             if self.x < house_left or self.x > house_right:
                 self.x = door_x
             
@@ -468,7 +1536,7 @@ class Ghost:
                 self.y = row_11_center
                 self.mode = 'active'
                 # Give them a random starting direction (left or right)
-                self.dir = random.choice([(-1, 0), (1, 0)])
+                self.dir = self.rng.choice([(-1, 0), (1, 0)])
             return
 
         # frightened timer handling
@@ -482,55 +1550,29 @@ class Ghost:
         aligned = abs(self.x - tx * TILE - TILE//2) < 3 and abs(self.y - ty * TILE - TILE//2) < 3
 
         if aligned:
-            dirs = []
-            for d in [(0,-1), (0,1), (-1,0), (1,0)]:
-                if d != (-self.dir[0], -self.dir[1]):
-                    nx = self.x + d[0] * TILE
-                    ny = self.y + d[1] * TILE
-                    ntx, nty = int(nx // TILE), int(ny // TILE)
-                    
-                    # Prevent ghosts from going back into the ghost house area
-                    # Ghost house is rows 12-16, columns 10-17
-                    if 12 <= nty <= 16 and 10 <= ntx <= 17:
-                        continue  # Skip this direction - it leads into the house
-                    
-                    # Allow tunnel wrapping - if going off edge horizontally, it's valid
-                    if ntx < 0 or ntx >= len(maze[0]):
-                        dirs.append(d)  # Tunnel wrap is always valid
-                    elif not self.collides(nx, ny, maze):
-                        dirs.append(d)
+            # Legal exits (house and tunnel wrap already folded in), minus reversing
+            exits = nav.ghost_exits(tx, ty) & ~DIR_BITS.get((-self.dir[0], -self.dir[1]), 0)
+            dirs = EXIT_DIRS[exits]
             
             if dirs:
                 if self.mode == 'frightened':
                     # frightened ghosts move randomly and slower
                     self.speed = max(0.8, self.base_speed * 0.6)
-                    self.dir = random.choice(dirs)
+                    self.dir = self.rng.choice(dirs)
                 else:
-                    if random.random() < 0.7:
-                        dx = player_pos[0] - self.x
-                        dy = player_pos[1] - self.y
-                        if abs(dx) > abs(dy):
-                            pref = (1 if dx > 0 else -1, 0)
-                        else:
-                            pref = (0, 1 if dy > 0 else -1)
-                        if pref in dirs:
-                            self.dir = pref
-                        else:
-                            self.dir = random.choice(dirs)
-                    else:
-                        self.dir = random.choice(dirs)
+                    self.dir = paths.step_toward(tx, ty, dirs, target_for(self))
         
         nx = self.x + self.dir[0] * self.speed
         ny = self.y + self.dir[1] * self.speed
         ntx, nty = int(nx // TILE), int(ny // TILE)
         
         # Prevent active/frightened ghosts from moving into ghost house
-        can_move = True
-        if self.mode in ('active', 'frightened'):
-            if 12 <= nty <= 16 and 10 <= ntx <= 17:
-                can_move = False  # Don't move into the house
+        attr = tiles.at(ntx, nty)
+        can_move = not attr & TILE_WALL
+        if self.mode in ('active', 'frightened') and attr & TILE_HOUSE:
+            can_move = False  # Don't move into the house
         
-        if can_move and not self.collides(nx, ny, maze):
+        if can_move:
             self.x, self.y = nx, ny
         
         # Wrap through tunnel
@@ -539,154 +1581,339 @@ class Ghost:
         elif self.x > SCREEN_WIDTH - TILE//2:
             self.x = -TILE//2 + 1
         
-        # Slow down in tunnel (when in T tiles on either edge)
-        tx = int(self.x // TILE)
-        if tx < 6 or tx >= 22:  # Tunnel area on edges
+        # Slow down in tunnel (the tunnel columns on either edge)
+        if tiles.at(int(self.x // TILE), int(self.y // TILE)) & TILE_SLOW:
             self.speed = self.base_speed * 0.5
         elif self.mode != 'frightened':
             self.speed = self.base_speed
     
-    def collides(self, x, y, maze):
-        tx, ty = int(x // TILE), int(y // TILE)
-        # Allow horizontal out of bounds (tunnel wrapping)
-        if tx < 0 or tx >= len(maze[0]):
-            return False
-        if 0 <= ty < len(maze) and 0 <= tx < len(maze[0]):
-            cell = maze[ty][tx]
-            # Allow ghosts to pass through door tiles ('-') and tunnel ('T')
-            if cell in ('-', 'T', ' '):
-                return False
-            return cell == '#'
-        return True
-    
-    def draw(self, screen):
+    def draw(self, screen, alpha=1.0, scale=1.0):
+        """Draw at `scale` screen pixels per game pixel; returns the rect drawn to."""
+        x, y = interpolate(self, alpha)
         if self.img:
             # Use frightened image if available and in frightened mode
-            if self.mode == 'frightened' and self.frightened_img:
-                screen.blit(self.frightened_img, (self.x-TILE//2+2, self.y-TILE//2+2))
-            else:
-                screen.blit(self.img, (self.x-TILE//2+2, self.y-TILE//2+2))
-        else:
-            draw_color = (0, 0, 255) if getattr(self, 'mode', None) == 'frightened' else self.color
-            pygame.draw.circle(screen, draw_color, (int(self.x), int(self.y)), TILE//2-2)
+            img = self.frightened_img if self.mode == 'frightened' and self.frightened_img else self.img
+            return screen.blit(img, ((x-TILE//2+2) * scale, (y-TILE//2+2) * scale))
+        draw_color = (0, 0, 255) if getattr(self, 'mode', None) == 'frightened' else self.color
+        return pygame.draw.circle(screen, draw_color, (int(x * scale), int(y * scale)), int((TILE//2-2) * scale))
 
-class Game:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("Open-Pac")
-        self.clock = pygame.time.Clock()
-        self.controls = Controls()
-        self.hs = HighScores()
+class GhostSwarm:
+    """Struct-of-arrays ghost engine for the many-ghost stress mode.
+
+    Positions, directions, speeds, modes and timers of all ghosts live in
+    NumPy arrays and every frame is a fixed number of batched array
+    operations, whatever the ghost count. They are released and frightened
+    like the classic ghosts, but don't steer like them: instead of following
+    the PathTable to a per-ghost target (and the scatter waves), an active
+    swarm ghost at a junction heads along the longer axis toward the player
+    70% of the time and takes a random open exit otherwise, or always when
+    frightened.
+    """
+    HOUSE, LEAVING, ACTIVE, FRIGHTENED = 0, 1, 2, 3
+
+    def __init__(self, count, tiles, rng=None):
+        if np is None:
+            raise RuntimeError("the ghost swarm needs numpy (pip install numpy)")
+        self.count = count
+        self.rng = rng if rng is not None else np.random.default_rng()
+        idx = np.arange(count)
+        # Spread the ghosts over the house interior
+        cols = HOUSE_RIGHT - HOUSE_LEFT - 1
+        rows = HOUSE_BOTTOM - HOUSE_TOP - 1
+        self.x = (TILE * (HOUSE_LEFT + 1 + idx % cols) + TILE // 2).astype(np.float64)
+        self.y = (TILE * (HOUSE_TOP + 1 + (idx // cols) % rows) + TILE // 2).astype(np.float64)
+        self.dx = np.zeros(count, dtype=np.int64)
+        self.dy = np.full(count, -1, dtype=np.int64)  # Start moving up toward the door
+        self.prev_x = self.x.copy()  # positions at the previous tick, for interpolation
+        self.prev_y = self.y.copy()
+        self.base_speed = np.full(count, 1.5)
+        self.speed = self.base_speed.copy()
+        self.mode = np.full(count, self.HOUSE, dtype=np.int8)
+        # Release over the same 1-5 seconds as the classic five ghosts
+        self.release_timer = FPS + idx * 4 * FPS // max(1, count - 1)
+        self.frightened_timer = np.zeros(count, dtype=np.int64)
+        self.color = idx % len(GHOST_COLORS)
+        self.attrs = np.frombuffer(tiles.attrs, dtype=np.uint8).reshape(tiles.height, tiles.width)
+        # Random-choice tables: the directions allowed by each exit mask
+        self.choice_n = np.array([len(dirs) for dirs in EXIT_DIRS])
+        self.choice_dx = np.zeros((16, 4), dtype=np.int64)
+        self.choice_dy = np.zeros((16, 4), dtype=np.int64)
+        for mask, dirs in enumerate(EXIT_DIRS):
+            for k, (ddx, ddy) in enumerate(dirs):
+                self.choice_dx[mask, k] = ddx
+                self.choice_dy[mask, k] = ddy
+
+    def set_difficulty(self, base_speed, release_multiplier):
+        self.base_speed[:] = base_speed
+        self.speed[:] = base_speed
+        self.release_timer = (self.release_timer * release_multiplier).astype(np.int64)
+
+    @staticmethod
+    def dir_bits(dx, dy):
+        return (np.where(dy < 0, 1, 0) | np.where(dy > 0, 2, 0)
+                | np.where(dx < 0, 4, 0) | np.where(dx > 0, 8, 0))
+
+    def tile_attrs(self, tx, ty):
+        """TileMap.at() for arrays of tiles."""
+        h, w = self.attrs.shape
+        inside = self.attrs[np.clip(ty, 0, h - 1), np.clip(tx, 0, w - 1)]
+        return np.where((tx >= 0) & (tx < w), np.where((ty >= 0) & (ty < h), inside, TILE_WALL),
+                        TILE_TUNNEL | TILE_SLOW)
+
+    def update(self, nav, player_pos):
+        x, y, dx, dy = self.x, self.y, self.dx, self.dy
+        speed, mode, n = self.speed, self.mode, self.count
+        tx = (x // TILE).astype(np.int64)
+        ty = (y // TILE).astype(np.int64)
+        roam = (mode == self.ACTIVE) | (mode == self.FRIGHTENED)
+        # Safety check: active/frightened ghosts inside the house switch to leaving
+        mode[roam & ((self.tile_attrs(tx, ty) & TILE_HOUSE) != 0)] = self.LEAVING
+        house = mode == self.HOUSE
+        leaving = mode == self.LEAVING
+        roam = (mode == self.ACTIVE) | (mode == self.FRIGHTENED)
+
+        # House: count down, then start moving up toward the door
+        self.release_timer[house] -= 1
+        released = house & (self.release_timer <= 0)
+        mode[released] = self.LEAVING
+        dx[released] = 0
+        dy[released] = -1
+
+        # Leaving: line up with the door, then go up into the corridor above it
+        if leaving.any():
+            door_x = HOUSE_DOOR_X
+            row_11_center = HOUSE_EXIT_Y
+            x[leaving & ((x < TILE * (HOUSE_LEFT + 1)) | (x > TILE * HOUSE_RIGHT))] = door_x
+            sideways = leaving & (np.abs(x - door_x) > speed)
+            x[sideways] += np.where(x < door_x, speed, -speed)[sideways]
+            lined_up = leaving & ~sideways
+            x[lined_up] = door_x
+            rising = lined_up & (y > row_11_center)
+            y[rising] -= speed[rising]
+            out = lined_up & ~rising
+            if out.any():
+                y[out] = row_11_center
+                mode[out] = self.ACTIVE
+                dx[out] = self.rng.choice([-1, 1], size=int(out.sum()))
+                dy[out] = 0
+
+        if not roam.any():
+            return
+
+        # Frightened timer handling
+        fright = roam & (mode == self.FRIGHTENED)
+        self.frightened_timer[fright] -= 1
+        calm = fright & (self.frightened_timer <= 0)
+        mode[calm] = self.ACTIVE
+        speed[calm] = self.base_speed[calm]
+        fright &= ~calm
+
+        # Pick a new direction at tile centers from the nav table
+        aligned = roam & (np.abs(x - tx * TILE - TILE // 2) < 3) & (np.abs(y - ty * TILE - TILE // 2) < 3)
+        exits = np.frombuffer(nav.ghost, dtype=np.uint8)[np.clip(ty, 0, nav.height - 1) * nav.width + tx % nav.width]
+        exits = exits & ~self.dir_bits(-dx, -dy)
+        choose = aligned & (exits != 0)
+        if choose.any():
+            speed[choose & fright] = np.maximum(0.8, self.base_speed * 0.6)[choose & fright]
+            k = (self.rng.random(n) * self.choice_n[exits]).astype(np.int64)
+            new_dx = self.choice_dx[exits, k]
+            new_dy = self.choice_dy[exits, k]
+            # Active ghosts head along the longer axis toward the player 70% of the time
+            px = player_pos[0] - x
+            py = player_pos[1] - y
+            horizontal = np.abs(px) > np.abs(py)
+            pref_dx = np.where(horizontal, np.where(px > 0, 1, -1), 0)
+            pref_dy = np.where(horizontal, 0, np.where(py > 0, 1, -1))
+            chase = ~fright & (self.rng.random(n) < 0.7) & ((exits & self.dir_bits(pref_dx, pref_dy)) != 0)
+            dx[choose] = np.where(chase, pref_dx, new_dx)[choose]
+            dy[choose] = np.where(chase, pref_dy, new_dy)[choose]
+
+        # Move unless that runs into a wall or back into the house
+        nx = x + dx * speed
+        ny = y + dy * speed
+        ntx = (nx // TILE).astype(np.int64)
+        nty = (ny // TILE).astype(np.int64)
+        move = roam & ((self.tile_attrs(ntx, nty) & (TILE_WALL | TILE_HOUSE)) == 0)
+        x[move] = nx[move]
+        y[move] = ny[move]
+
+        # Wrap through tunnel
+        x[roam & (x < -TILE//2)] = SCREEN_WIDTH - TILE//2
+        x[roam & (x > SCREEN_WIDTH - TILE//2)] = -TILE//2 + 1
+
+        # Slow down in tunnel (the tunnel columns on either edge)
+        tx = (x // TILE).astype(np.int64)
+        ty = (y // TILE).astype(np.int64)
+        tunnel = roam & ((self.tile_attrs(tx, ty) & TILE_SLOW) != 0)
+        speed[tunnel] = self.base_speed[tunnel] * 0.5
+        normal = roam & ~tunnel & (mode != self.FRIGHTENED)
+        speed[normal] = self.base_speed[normal]
+
+    def collide(self, px, py):
+        """Return (indices of frightened ghosts touching the player, whether any other ghost does)."""
+        hit = (self.x - px) ** 2 + (self.y - py) ** 2 < (TILE//2) ** 2
+        frightened = self.mode == self.FRIGHTENED
+        return np.flatnonzero(hit & frightened), bool((hit & ~frightened).any())
+
+    def send_home(self, idx):
+        # Return to center of ghost house (top row - closer to door)
+        self.mode[idx] = self.HOUSE
+        self.x[idx] = HOUSE_DOOR_X
+        self.y[idx] = HOUSE_HOME_Y
+        self.release_timer[idx] = FPS  # Quick re-release (1 second)
+        self.speed[idx] = self.base_speed[idx]
+
+    def frighten(self, duration):
+        m = self.mode != self.HOUSE
+        self.mode[m] = self.FRIGHTENED
+        self.frightened_timer[m] = duration
+        self.speed[m] = np.maximum(0.8, self.base_speed[m] * 0.6)
+        self.dx[m] = -self.dx[m]
+        self.dy[m] = -self.dy[m]
+
+    def calm(self):
+        self.mode[:] = self.ACTIVE
+        self.frightened_timer[:] = 0
+
+    def any_frightened(self):
+        return bool((self.mode == self.FRIGHTENED).any())
+
+
+class DifficultyCurve:
+    """How the ghosts get tougher from level to level; the defaults are the shipped game.
+
+    Ghost speed is ghost_speed + min(level * speed_step, speed_cap), release
+    times are scaled by max(release_floor, 1 - level * release_step) and
+    frightened mode lasts max(frightened_floor, frightened_seconds - level *
+    frightened_step) seconds.
+    """
+    DEFAULTS = {
+        'ghost_speed': 1.5, 'speed_step': 0.05, 'speed_cap': 1.0,
+        'release_step': 0.03, 'release_floor': 0.3,
+        'frightened_seconds': 15, 'frightened_step': 0.5, 'frightened_floor': 5,
+    }
+
+    def __init__(self, **params):
+        unknown = set(params) - set(self.DEFAULTS)
+        if unknown:
+            raise ValueError(f"unknown difficulty parameter(s): {', '.join(sorted(unknown))}")
+        for name, default in self.DEFAULTS.items():
+            setattr(self, name, params.get(name, default))
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.DEFAULTS}
+
+    def speed_bonus(self, level):
+        return min(level * self.speed_step, self.speed_cap)
+
+    def release_multiplier(self, level):
+        return max(self.release_floor, 1.0 - level * self.release_step)
+
+    def frightened_duration(self, level):
+        """Frightened mode length in ticks."""
+        return max(self.frightened_floor * FPS, int((self.frightened_seconds - level * self.frightened_step) * FPS))
+
+
+class Simulation:
+    """Pure game logic: maze, player, ghosts, score, fruit and state timers.
+
+    Never touches the display or the mixer, so it can be stepped headless.
+    Sounds and effects the front end should play are reported as event
+    tuples from step(), e.g. ('pellet', x, y) or ('ghost_eaten', idx).
+
+    All randomness comes from per-game streams derived from `seed`, so the
+    same seed and the same inputs to step() always replay the same game.
+    """
+    def __init__(self, assets=None, swarm_size=0, seed=None, profiler=None, curve=None):
+        self.assets = assets  # Assets for sprites, None when running headless
+        self.curve = curve or DifficultyCurve()  # per-level ghost speed, release and frightened times
+        self.profiler = profiler or Profiler(capacity=1, enabled=False)  # phase timings of step()
+        self.swarm_size = swarm_size  # stress mode: this many GhostSwarm ghosts instead of the classic five
+        self.fixed_seed = seed  # every new_game() reuses this seed; None draws a fresh one per game
+        self.seed_rngs(seed)
         self.state = 'MENU'
-        self.joystick = None
-        if pygame.joystick.get_count() > 0:
-            self.joystick = pygame.joystick.Joystick(0)
         self.level = 0
         self.lives = 3
-        self.initials = ""
+        self.score = 0
         self.ready_timer = 0  # Timer for READY state auto-continue
-        self.high_scores_timer = 0  # Timer for HIGH_SCORES auto-return to menu
         self.frightened_duration = 15 * FPS  # Default, will be adjusted per level
         self.death_timer = 0  # Timer for death animation
         self.death_spin_angle = 0  # Rotation angle during death
         self.flash_timer = 0  # Timer for flashing power pellets
-        # assets directory (where sounds/images live)
-        self.assets_dir = os.path.dirname(os.path.abspath(__file__))
-        # init mixer and load sounds (best-effort)
-        try:
-            pygame.mixer.init()
-        except Exception:
-            pass
-        self.snd_chomp = None
-        self.snd_power = None
-        self.snd_eatghost = None
-        try:
-            self.snd_chomp = pygame.mixer.Sound(os.path.join(self.assets_dir, 'chomp.mp3'))
-            self.snd_chomp.set_volume(1.3)  # Boost volume by 30%
-        except Exception:
-            pass
-        try:
-            self.snd_power = pygame.mixer.Sound(os.path.join(self.assets_dir, 'powerpellet.mp3'))
-        except Exception:
-            # try alternate names
-            try:
-                self.snd_power = pygame.mixer.Sound(os.path.join(self.assets_dir, 'power.mp3'))
-            except Exception:
-                self.snd_power = None
-        try:
-            self.snd_eatghost = pygame.mixer.Sound(os.path.join(self.assets_dir, 'ghosteatin.mp3'))
-        except Exception:
-            self.snd_eatghost = None
-        try:
-            self.snd_death = pygame.mixer.Sound(os.path.join(self.assets_dir, 'pacman_death.mp3'))
-        except Exception:
-            self.snd_death = None
-        
-        # Background music tracking
-        self.playing_power_music = False
+        self.power_active = False  # Power pellet effect (and its music) running
+        self.events = []
 
-        # Load logo image
-        try:
-            self.logo_img = pygame.image.load(os.path.join(self.assets_dir, 'openpac_logo.png')).convert_alpha()
-        except Exception:
-            self.logo_img = None
-
-        # Load arcade font
-        self.arcade_font_path = os.path.join(self.assets_dir, 'arcade.ttf')
-        try:
-            self.arcade_font = pygame.font.Font(self.arcade_font_path, 24)
-            self.arcade_font_large = pygame.font.Font(self.arcade_font_path, 48)
-            self.arcade_font_small = pygame.font.Font(self.arcade_font_path, 18)
-        except Exception:
-            self.arcade_font = pygame.font.Font(None, 36)
-            self.arcade_font_large = pygame.font.Font(None, 72)
-            self.arcade_font_small = pygame.font.Font(None, 28)
-
-        # Load fruit images and setup fruit system
+        # Fruit system
         self.fruit_types = ['cherry', 'apple', 'strawberry', 'orange', 'grapes']
         self.fruit_points = {'cherry': 300, 'apple': 500, 'strawberry': 700, 'orange': 1000, 'grapes': 1500}
-        self.fruit_images = {}
-        for fruit in self.fruit_types:
-            try:
-                img = pygame.image.load(os.path.join(self.assets_dir, f'{fruit}.png')).convert_alpha()
-                self.fruit_images[fruit] = pygame.transform.smoothscale(img, (TILE-4, TILE-4))
-            except Exception:
-                self.fruit_images[fruit] = None
-        
-        # Fruit state
         self.fruit_active = None  # Current fruit type or None
         self.fruit_timer = 0  # Timer for fruit visibility
         self.fruit_cooldown = 0  # Cooldown before next fruit can appear (90 seconds = 5400 frames)
         self.fruit_x = TILE * 14 + TILE // 2  # Center of maze (column 14)
         self.fruit_y = TILE * 17 + TILE // 2  # Below ghost house (row 17)
+        self.reset_level()
+
+    @property
+    def paths(self):
+        return self.template.paths
 
-        # music file (intro)
-        self.intro_music = os.path.join(self.assets_dir, 'intro.mp3')
+    def player_frames(self):
+        return self.assets.player_frames() if self.assets else None
+
+    def ghost_sprites(self, idx):
+        return self.assets.ghost_sprites(idx) if self.assets else None
+
+    def seed_rngs(self, seed=None):
+        """(Re)seed the ghost, fruit and swarm random streams."""
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        self.ghost_rng = random.Random(f"{self.seed}/ghosts")
+        self.fruit_rng = random.Random(f"{self.seed}/fruit")
+        self.swarm_rng = None  # numpy Generator, created with the first swarm
+
+    def new_game(self, seed=None):
+        self.seed_rngs(seed if seed is not None else self.fixed_seed)
+        self.level = 0
+        self.lives = 3
+        self.score = 0
+        # Timers left over from a previous game would change this one's replay
+        self.ready_timer = 0
+        self.death_timer = 0
+        self.death_spin_angle = 0
+        self.flash_timer = 0
         self.reset_level()
-    
-    def reset_level(self):
-        # Generate unique maze for this level (procedural generation)
-        self.maze = [list(row) for row in generate_maze(self.level)]
-        img_dir = r"D:\python games\openpac"
+        self.state = 'PLAYING'
+
+    def next_level(self):
+        self.level += 1
+        self.reset_level()
+        self.state = 'PLAYING'
+
+    def find_pac_start(self):
         # Find a valid open tile for Pac-Man to start (preferably row 23, col 14)
         pac_start_x, pac_start_y = 14, 23
-        found = False
         for y in range(20, HEIGHT):
             if self.maze[y][pac_start_x] in (' ', '.', 'o'):
-                pac_start_y = y
-                found = True
-                break
-        if not found:
-            # Fallback: find any open tile
-            for y in range(HEIGHT):
-                for x in range(WIDTH):
-                    if self.maze[y][x] in (' ', '.', 'o'):
-                        pac_start_x, pac_start_y = x, y
-                        found = True
-                        break
-                if found:
-                    break
-        self.player = Player(TILE * pac_start_x + TILE // 2, TILE * pac_start_y + TILE // 2, os.path.join(img_dir, 'thepac.png'))
+                return pac_start_x, y
+        # Fallback: find any open tile
+        for y in range(HEIGHT):
+            for x in range(WIDTH):
+                if self.maze[y][x] in (' ', '.', 'o'):
+                    return x, y
+        return pac_start_x, pac_start_y
+
+    def reset_level(self):
+        # Generate unique maze for this level (procedural generation)
+        # The layout is shared with every other level and game on the same maze;
+        # only the pellets are this level's own
+        self.template = MazeTemplate.for_level(self.level)
+        self.maze = self.template.rows
+        self.tiles = self.template.tiles
+        self.nav = self.template.nav
+        self.pellets = PelletIndex(self.template)
+        self.wave_tick = 0  # time into the scatter/chase waves
+        self.scatter = True  # ghosts head for their corners (first wave is scatter)
+        pac_start_x, pac_start_y = self.find_pac_start()
+        self.player = Player(TILE * pac_start_x + TILE // 2, TILE * pac_start_y + TILE // 2, self.player_frames())
         self.player.next_dir = (0, -1)  # Force movement up at spawn
         # Ghosts start in the house spread across rows 13-14
         # Ghost house interior is columns 11-16, rows 13-15, door at columns 13-14 row 12
@@ -698,242 +1925,125 @@ class Game:
             (13, 14),  # Ghost 4: center, middle row
         ]
         self.ghosts = []
-        for i in range(5):
-            gx, gy = ghost_positions[i]
-            ghost = Ghost(TILE * gx + TILE // 2, TILE * gy + TILE // 2, os.path.join(img_dir, f'ghost{i+1}.png'), i)
-            self.ghosts.append(ghost)
+        self.entities = SpatialHash()  # ghosts and fruit, for collisions with the player
+        self.swarm = None
+        if self.swarm_size:
+            if self.swarm_rng is None:
+                self.swarm_rng = np.random.default_rng([self.seed, 1])
+            self.swarm = GhostSwarm(self.swarm_size, self.tiles, self.swarm_rng)
+        else:
+            for i in range(5):
+                gx, gy = ghost_positions[i]
+                ghost = Ghost(TILE * gx + TILE // 2, TILE * gy + TILE // 2, self.ghost_sprites(i), i, self.ghost_rng)
+                self.ghosts.append(ghost)
+                self.entities.move(ghost, ghost.x, ghost.y)
         
-        # Difficulty scaling based on level
-        # Ghost speed increases slightly each level (caps at level 20)
-        speed_bonus = min(self.level * 0.05, 1.0)  # Max +1.0 speed at level 20
-        # Ghost release time decreases each level
-        release_multiplier = max(0.3, 1.0 - self.level * 0.03)  # Min 30% of original at level ~23
-        # Frightened duration decreases each level (min 5 seconds)
-        self.frightened_duration = max(5 * FPS, int((15 - self.level * 0.5) * FPS))
+        # Difficulty scaling based on level (see DifficultyCurve)
+        # Ghost speed increases slightly each level, release times and frightened mode get shorter
+        ghost_speed = self.curve.ghost_speed + self.curve.speed_bonus(self.level)
+        release_multiplier = self.curve.release_multiplier(self.level)
+        self.frightened_duration = self.curve.frightened_duration(self.level)
         
         for g in self.ghosts:
-            g.base_speed = 1.5 + speed_bonus
+            g.base_speed = ghost_speed
             g.speed = g.base_speed
             g.release_timer = int(g.release_timer * release_multiplier)
+        if self.swarm is not None:
+            self.swarm.set_difficulty(ghost_speed, release_multiplier)
         
-        self.score = getattr(self, 'score', 0)
+        self.power_active = False
         # Reset fruit state for new level
         self.fruit_active = None
         self.fruit_timer = 0
-        self.fruit_cooldown = random.randint(5 * FPS, 15 * FPS)  # First fruit appears 5-15 seconds into level
+        self.fruit_cooldown = self.fruit_rng.randint(5 * FPS, 15 * FPS)  # First fruit appears 5-15 seconds into level
 
     def reset_positions_only(self):
         """Reset player position only without resetting ghosts or maze."""
-        img_dir = r"D:\python games\openpac"
         # Find valid spawn for Pac-Man - use fixed position row 23, col 14
-        pac_start_x, pac_start_y = 14, 23
-        found = False
-        for y in range(20, HEIGHT):
-            if self.maze[y][pac_start_x] in (' ', '.', 'o'):
-                pac_start_y = y
-                found = True
-                break
-        if not found:
-            for y in range(HEIGHT):
-                for x in range(WIDTH):
-                    if self.maze[y][x] in (' ', '.', 'o'):
-                        pac_start_x, pac_start_y = x, y
-                        found = True
-                        break
-                if found:
-                    break
-        self.player = Player(TILE * pac_start_x + TILE // 2, TILE * pac_start_y + TILE // 2, os.path.join(img_dir, 'thepac.png'))
+        pac_start_x, pac_start_y = self.find_pac_start()
+        self.player = Player(TILE * pac_start_x + TILE // 2, TILE * pac_start_y + TILE // 2, self.player_frames())
         self.player.next_dir = (0, -1)
+        self.wave_tick = 0
         # Don't reset ghost positions - just clear frightened mode
         for ghost in self.ghosts:
             ghost.mode = 'active'
             ghost.frightened_timer = 0
-    
-    def handle_input(self):
-        keys = pygame.key.get_pressed()
-        # Also check arrow keys in addition to configured bindings
-        try:
-            up_pressed = keys[self.controls.kb['up']] or keys[pygame.K_UP]
-            down_pressed = keys[self.controls.kb['down']] or keys[pygame.K_DOWN]
-            left_pressed = keys[self.controls.kb['left']] or keys[pygame.K_LEFT]
-            right_pressed = keys[self.controls.kb['right']] or keys[pygame.K_RIGHT]
-        except Exception:
-            up_pressed = keys[self.controls.kb['up']]
-            down_pressed = keys[self.controls.kb['down']]
-            left_pressed = keys[self.controls.kb['left']]
-            right_pressed = keys[self.controls.kb['right']]
-        # Handle movement FIRST, every frame
+        if self.swarm is not None:
+            self.swarm.calm()
+
+    def step(self, direction=None, select=False, turbo=False):
+        """Advance one frame and return the events it produced.
+
+        `direction` replaces the player's queued turn, `select` is the ENTER
+        key (skips READY, starts the next level) and `turbo` toggles the F12
+        speed test. These are everything an InputLog records.
+        """
+        self.events = events = []
+        if select:
+            if self.state == 'READY':
+                self.ready_timer = 0
+                self.state = 'PLAYING'
+            elif self.state == 'LEVEL_COMPLETE':
+                self.next_level()
         if self.state == 'PLAYING':
-            moved = False
-            # Prefer up/down/left/right state computed above (includes arrows)
-            if up_pressed:
-                self.player.next_dir = (0, -1)
-                moved = True
-            elif down_pressed:
-                self.player.next_dir = (0, 1)
-                moved = True
-            elif left_pressed:
-                self.player.next_dir = (-1, 0)
-                moved = True
-            elif right_pressed:
-                self.player.next_dir = (1, 0)
-                moved = True
-            
-            if moved:
-                pass  # Movement registered
-            
-            if self.joystick:
-                hat = self.joystick.get_hat(0)
-                if hat[1] == 1:
-                    self.player.next_dir = (0, -1)
-                elif hat[1] == -1:
-                    self.player.next_dir = (0, 1)
-                elif hat[0] == -1:
-                    self.player.next_dir = (-1, 0)
-                elif hat[0] == 1:
-                    self.player.next_dir = (1, 0)
-        
-        # Then handle events
-        for e in pygame.event.get():
-            if e.type == pygame.QUIT:
-                return False
-            if e.type == pygame.KEYDOWN:
-                if self.state == 'ENTER_INITIALS':
-                    if e.key == pygame.K_RETURN and len(self.initials) > 0:
-                        self.hs.add(self.initials.upper(), self.score)
-                        self.state = 'HIGH_SCORES'
-                        self.high_scores_timer = FPS * 5  # Show for 5 seconds then return to menu
-                    elif e.key == pygame.K_BACKSPACE:
-                        self.initials = self.initials[:-1]
-                    elif e.unicode.isalpha() and len(self.initials) < 3:
-                        self.initials += e.unicode
+            if direction is not None:
+                self.player.next_dir = direction
+            if turbo:
+                # Toggle 5x speed test mode
+                self.player.speed_test = not self.player.speed_test
+                if self.player.speed_test:
+                    self.player.speed = self.player.base_speed * 5
                 else:
-                    # Global/GUI keys
-                    if e.key == self.controls.kb['scores']:
-                        self.state = 'HIGH_SCORES'
-                    elif e.key == self.controls.kb['menu']:
-                        if self.state == 'PLAYING':
-                            self.state = 'MENU'
-                        elif self.state in ['HIGH_SCORES', 'GAME_OVER']:
-                            self.state = 'MENU'
-                    elif e.key == self.controls.kb['select']:
-                        if self.state == 'MENU':
-                            self.level = 0
-                            self.lives = 3
-                            self.score = 0
-                            self.reset_level()
-                            # Play intro music if available
-                            try:
-                                if os.path.exists(self.intro_music):
-                                    pygame.mixer.music.load(self.intro_music)
-                                    pygame.mixer.music.play(-1)
-                            except Exception:
-                                pass
-                            self.state = 'PLAYING'
-                        elif self.state == 'READY':
-                            self.state = 'PLAYING'
-                        elif self.state == 'LEVEL_COMPLETE':
-                            self.level += 1
-                            self.reset_level()
-                            self.state = 'PLAYING'
-                    # Immediate movement on KEYDOWN (supports arrows + WASD)
-                    if self.state == 'PLAYING':
-                        if e.key in (pygame.K_w, pygame.K_UP):
-                            self.player.next_dir = (0, -1)
-                        elif e.key in (pygame.K_s, pygame.K_DOWN):
-                            self.player.next_dir = (0, 1)
-                        elif e.key in (pygame.K_a, pygame.K_LEFT):
-                            self.player.next_dir = (-1, 0)
-                        elif e.key in (pygame.K_d, pygame.K_RIGHT):
-                            self.player.next_dir = (1, 0)
-                        elif e.key == pygame.K_F12:
-                            # Toggle 5x speed test mode
-                            self.player.speed_test = not self.player.speed_test
-                            if self.player.speed_test:
-                                self.player.speed = self.player.base_speed * 5
-                            else:
-                                self.player.speed = self.player.base_speed
-        return True
-    
-    def update(self):
+                    self.player.speed = self.player.base_speed
+
         # Handle READY state - auto-continue after 2 seconds
         if self.state == 'READY':
             self.ready_timer += 1
             if self.ready_timer >= 2 * FPS:  # 2 seconds
                 self.ready_timer = 0
                 self.state = 'PLAYING'
-            return
-        
-        # Handle HIGH_SCORES state - auto-return to menu after timer expires
-        if self.state == 'HIGH_SCORES' and self.high_scores_timer > 0:
-            self.high_scores_timer -= 1
-            if self.high_scores_timer <= 0:
-                self.state = 'MENU'
-                self.initials = ""
-            return
+            return events
         
         # Handle death animation
         if self.state == 'DYING':
             self.death_timer += 1
             self.death_spin_angle += 15  # Spin speed (degrees per frame)
             
-            # Stop power pellet music if playing
-            if self.playing_power_music:
-                try:
-                    if self.snd_power:
-                        self.snd_power.stop()
-                except Exception:
-                    pass
-                self.playing_power_music = False
-            
             # Death animation lasts about 1.5 seconds (90 frames)
             if self.death_timer >= 90:
                 self.lives -= 1
                 if self.lives <= 0:
                     self.state = 'ENTER_INITIALS' if self.score > 0 else 'GAME_OVER'
+                    events.append(('game_over',))
                 else:
                     # Only reset positions, not the maze (keep pellets as-is)
                     self.reset_positions_only()
                     self.state = 'READY'
-                    # Restart intro music
-                    try:
-                        pygame.mixer.music.load(self.intro_music)
-                        pygame.mixer.music.play(-1)
-                    except Exception:
-                        pass
-            return
+                    events.append(('respawn',))
+            return events
         
         # Always update flash timer for power pellets
         self.flash_timer += 1
         
         if self.state == 'PLAYING':
-            self.player.update(self.maze)
+            prof = self.profiler
+            t = prof.now()
+            self.player.update(self.tiles, self.nav)
+            t = prof.lap('player.update', t)
             
             # Collect pellets
             tx = int(self.player.x // TILE)
             ty = int(self.player.y // TILE)
-            if 0 <= ty < len(self.maze) and 0 <= tx < len(self.maze[0]):
-                if self.maze[ty][tx] == '.':
-                    self.maze[ty][tx] = ' '
+            pellet = self.pellets.eat(tx, ty)
+            if pellet:
+                if pellet == '.':
                     self.score += 10
-                    try:
-                        if self.snd_chomp:
-                            self.snd_chomp.play()
-                    except Exception:
-                        pass
-                elif self.maze[ty][tx] == 'o':
+                    events.append(('pellet', tx, ty))
+                else:
                     # Power pellet
-                    self.maze[ty][tx] = ' '
                     self.score += 50
-                    try:
-                        # Stop any current power pellet sound first, then restart it
-                        pygame.mixer.music.stop()
-                        if self.snd_power:
-                            self.snd_power.stop()  # Stop if already playing to prevent stacking
-                            self.snd_power.play(-1)  # Loop the power pellet sound
-                            self.playing_power_music = True
-                    except Exception:
-                        pass
+                    self.power_active = True
+                    events.append(('power_pellet', tx, ty))
                     # Set ghosts to frightened (duration scales with level)
                     for g in self.ghosts:
                         if g.mode not in ('house', 'eaten'):
@@ -941,15 +2051,20 @@ class Game:
                             g.frightened_timer = self.frightened_duration
                             g.speed = max(0.8, g.base_speed * 0.6)
                             g.dir = (-g.dir[0], -g.dir[1])
+                    if self.swarm is not None:
+                        self.swarm.frighten(self.frightened_duration)
+            t = prof.lap('pellets', t)
             
             # Fruit system update
             if self.fruit_active:
                 # Check if player collected the fruit
-                dist = ((self.player.x - self.fruit_x)**2 + (self.player.y - self.fruit_y)**2)**0.5
-                if dist < TILE//2:
+                px, py = self.player.x, self.player.y
+                if 'fruit' in self.entities.near(px, py) and within(px, py, self.fruit_x, self.fruit_y, TILE//2):
                     # Collect fruit!
                     self.score += self.fruit_points.get(self.fruit_active, 500)
+                    events.append(('fruit_eaten', self.fruit_active))
                     self.fruit_active = None
+                    self.entities.remove('fruit')
                     self.fruit_timer = 0
                     self.fruit_cooldown = 90 * FPS  # 1 minute 30 seconds before next fruit
                 else:
@@ -957,6 +2072,7 @@ class Game:
                     self.fruit_timer -= 1
                     if self.fruit_timer <= 0:
                         self.fruit_active = None
+                        self.entities.remove('fruit')
                         self.fruit_cooldown = 90 * FPS  # 1 minute 30 seconds before next fruit
             else:
                 # Countdown to next fruit appearance
@@ -964,182 +2080,1002 @@ class Game:
                     self.fruit_cooldown -= 1
                 else:
                     # Spawn a random fruit
-                    self.fruit_active = random.choice(self.fruit_types)
-                    self.fruit_timer = random.randint(8 * FPS, 12 * FPS)  # Visible for 8-12 seconds
+                    self.fruit_active = self.fruit_rng.choice(self.fruit_types)
+                    self.fruit_timer = self.fruit_rng.randint(8 * FPS, 12 * FPS)  # Visible for 8-12 seconds
+                    self.entities.move('fruit', self.fruit_x, self.fruit_y)
+                    events.append(('fruit_spawn', self.fruit_active))
             
             # Check level complete
-            pellets = sum(row.count('.') + row.count('o') for row in self.maze)
-            if pellets == 0:
+            if self.pellets.remaining == 0:
                 self.state = 'LEVEL_COMPLETE'
+                events.append(('level_complete',))
+            t = prof.lap('fruit', t)
             
             # Update ghosts
+            player_pos = (self.player.x, self.player.y)
+            self.wave_tick += 1
+            self.scatter = self.scatter_phase()
             for g in self.ghosts:
-                g.update(self.maze, (self.player.x, self.player.y))
-                dist = ((g.x - self.player.x)**2 + (g.y - self.player.y)**2)**0.5
-                if dist < TILE//2:
+                g.update(self.tiles, self.nav, self.paths, self.ghost_target)
+                self.entities.move(g, g.x, g.y)
+                t = prof.lap(g.profile_name, t)
+            # Only ghosts on or next to the player's tile can touch it (in ghost order,
+            # as the ghosts never affect each other's updates)
+            nearby = [g for g in self.entities.near(*player_pos) if isinstance(g, Ghost)]
+            for g in sorted(nearby, key=lambda g: g.idx):
+                if within(g.x, g.y, self.player.x, self.player.y, TILE//2):
                     if g.mode == 'frightened':
                         # Eat ghost: award points and send ghost home
                         self.score += 200
-                        try:
-                            if self.snd_eatghost:
-                                self.snd_eatghost.play()
-                        except Exception:
-                            pass
+                        events.append(('ghost_eaten', g.idx))
                         g.mode = 'house'
-                        # Return to center of ghost house (row 13 - closer to door)
-                        g.x = TILE * 13 + TILE  # center of house (between cols 13-14)
-                        g.y = TILE * 13 + TILE // 2  # row 13 (top of house, near door)
+                        # Return to center of ghost house (top row - closer to door)
+                        g.x = HOUSE_DOOR_X
+                        g.y = HOUSE_HOME_Y
                         g.release_timer = FPS  # Quick re-release (1 second)
                         g.speed = g.base_speed
+                        self.entities.move(g, g.x, g.y)
                     else:
                         # Start death animation
                         self.state = 'DYING'
                         self.death_timer = 0
                         self.death_spin_angle = 0
-                        try:
-                            if self.snd_death:
-                                self.snd_death.play()
-                        except Exception:
-                            pass
+                        self.power_active = False
+                        events.append(('death',))
+            t = prof.lap('ghost collisions', t)
+            if self.swarm is not None:
+                self.update_swarm(events)
+                prof.lap('swarm', t)
             
-            # Check if power pellet music should stop (no more frightened ghosts)
-            if self.playing_power_music:
-                any_frightened = any(g.mode == 'frightened' for g in self.ghosts)
-                if not any_frightened:
-                    try:
-                        if self.snd_power:
-                            self.snd_power.stop()
-                        pygame.mixer.music.load(self.intro_music)
-                        pygame.mixer.music.play(-1)  # Loop intro music
-                    except Exception:
-                        pass
-                    self.playing_power_music = False
+            # Power pellet effect ends once no ghost is frightened any more
+            if self.power_active:
+                if not any(g.mode == 'frightened' for g in self.ghosts) and not (
+                        self.swarm is not None and self.swarm.any_frightened()):
+                    self.power_active = False
+                    events.append(('power_end',))
+        return events
+
+    def scatter_phase(self):
+        """True while the scatter/chase waves have the ghosts heading for their corners."""
+        t = self.wave_tick
+        for i, seconds in enumerate(SCATTER_WAVES):
+            t -= seconds * FPS
+            if t < 0:
+                return i % 2 == 0
+        return False
+
+    def ghost_target(self, g):
+        """Tile index ghost `g` is heading for, by its strategy (or its corner while scattering)."""
+        corner = SCATTER_CORNERS[g.idx % 5]
+        if self.scatter:
+            return self.paths.tile(*corner)
+        p = self.player
+        ptx, pty = int(p.x // TILE), int(p.y // TILE)
+        pdx, pdy = p.dir
+        if g.strategy == 'chase':
+            target = (ptx, pty)
+        elif g.strategy == 'ambush':
+            # Four tiles ahead of Pac-Man
+            target = (ptx + 4 * pdx, pty + 4 * pdy)
+        elif g.strategy == 'flank':
+            # Double the vector from the first ghost to two tiles ahead of Pac-Man
+            bx, by = int(self.ghosts[0].x // TILE), int(self.ghosts[0].y // TILE)
+            target = (2 * (ptx + 2 * pdx) - bx, 2 * (pty + 2 * pdy) - by)
+        else:
+            # 'shy' chases until it gets close, 'patrol' guards its corner until Pac-Man comes near
+            here = self.paths.tile(int(g.x // TILE), int(g.y // TILE))
+            far = self.paths.distance(here, self.paths.tile(ptx, pty)) > SHY_DISTANCE
+            target = (ptx, pty) if far == (g.strategy == 'shy') else corner
+        return self.paths.tile(*target)
+
+    def state_hash(self):
+        """Digest of the full game state, used to check that a replay is bit-exact."""
+        h = hashlib.sha1(repr((
+            self.state, self.level, self.lives, self.score, self.pellets.remaining,
+            self.ready_timer, self.death_timer, self.death_spin_angle, self.flash_timer,
+            self.player.x, self.player.y, self.player.dir, self.player.next_dir, self.player.speed,
+            [(g.x, g.y, g.dir, g.mode, g.speed, g.release_timer, g.frightened_timer) for g in self.ghosts],
+            self.fruit_active, self.fruit_timer, self.fruit_cooldown, self.wave_tick,
+        )).encode())
+        h.update(self.pellets.bits)
+        if self.swarm is not None:
+            for array in (self.swarm.x, self.swarm.y, self.swarm.mode, self.swarm.speed):
+                h.update(array.tobytes())
+        return h.hexdigest()
+
+    def update_swarm(self, events):
+        """Advance the stress-mode swarm and resolve its collisions with the player."""
+        self.swarm.update(self.nav, (self.player.x, self.player.y))
+        eaten, caught = self.swarm.collide(self.player.x, self.player.y)
+        if len(eaten):
+            self.score += 200 * len(eaten)
+            events.extend(('ghost_eaten', int(i)) for i in eaten)
+            self.swarm.send_home(eaten)
+        if caught:
+            self.state = 'DYING'
+            self.death_timer = 0
+            self.death_spin_angle = 0
+            self.power_active = False
+            events.append(('death',))
+
+
+# Per-tick input encoding used by InputLog: direction index in the low bits plus flags
+INPUT_DIRS = [None, (0, -1), (0, 1), (-1, 0), (1, 0)]
+INPUT_SELECT = 8  # ENTER: skip READY / start the next level
+INPUT_TURBO = 16  # F12: toggle the 5x speed test
+
+
+def encode_input(direction=None, select=False, turbo=False):
+    return INPUT_DIRS.index(direction) | (INPUT_SELECT if select else 0) | (INPUT_TURBO if turbo else 0)
+
+
+def decode_input(code):
+    """Keyword arguments for Simulation.step() from an input byte."""
+    return {'direction': INPUT_DIRS[code & 7], 'select': bool(code & INPUT_SELECT), 'turbo': bool(code & INPUT_TURBO)}
+
+
+class InputLog:
+    """One byte of input per simulation tick of a game, plus what is needed to replay it.
+
+    Saved as JSON with the inputs zlib-compressed, which is a few KB for a full game.
+    VERSION changes whenever the game rules do, as older logs no longer replay.
+    """
+    VERSION = 4
+
+    def __init__(self, seed, swarm_size=0, inputs=None, final_hash=None):
+        self.seed = seed
+        self.swarm_size = swarm_size
+        self.inputs = inputs if inputs is not None else bytearray()
+        self.final_hash = final_hash  # Simulation.state_hash() after the last tick
+
+    def save(self, path, sim):
+        self.final_hash = sim.state_hash()
+        data = {
+            'version': self.VERSION, 'seed': self.seed, 'swarm_size': self.swarm_size,
+            'ticks': len(self.inputs), 'score': sim.score, 'level': sim.level,
+            'final_hash': self.final_hash,
+            'inputs': base64.b64encode(zlib.compress(bytes(self.inputs), 9)).decode('ascii'),
+        }
+        with open(path, 'w') as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get('version') != cls.VERSION:
+            raise ValueError(f"{path}: unsupported input log version {data.get('version')}")
+        inputs = bytearray(zlib.decompress(base64.b64decode(data['inputs'])))
+        return cls(data['seed'], data.get('swarm_size', 0), inputs, data.get('final_hash'))
+
+    def replay(self):
+        """Re-run the recorded game headless as fast as possible and return the Simulation."""
+        sim = Simulation(swarm_size=self.swarm_size)
+        sim.new_game(seed=self.seed)
+        decoded = {code: decode_input(code) for code in set(self.inputs)}
+        step = sim.step
+        for code in self.inputs:
+            step(**decoded[code])
+        return sim
+
+class StateView:
+    """A Simulation's state as NumPy arrays laid out in one persistent buffer.
+
+    `maze` holds the TILE_* bits of every tile, `pellets` is 1 where a pellet
+    is left and `entities` has one row per player, ghost and fruit (see
+    ENTITY_FIELDS). `header` is [seq, frame, score, lives, level, state code,
+    entity count, version]. update() refreshes the arrays in place; the maze
+    and pellet mask are only rewritten when they change. The arrays never
+    move, so callers can keep them, and the buffer can be shared memory (see
+    SharedState).
+    """
+    VERSION = 1
+    STATES = ['MENU', 'PLAYING', 'READY', 'DYING', 'LEVEL_COMPLETE', 'ENTER_INITIALS', 'GAME_OVER', 'HIGH_SCORES']
+    PLAYER, GHOST, FRUIT = 0, 1, 2  # entity kinds
+    MODES = {'house': GhostSwarm.HOUSE, 'leaving': GhostSwarm.LEAVING,
+             'active': GhostSwarm.ACTIVE, 'frightened': GhostSwarm.FRIGHTENED}
+    # Pixel position, direction, kind and ghost mode (fruit: 1 while shown)
+    ENTITY_FIELDS = [('x', '<f4'), ('y', '<f4'), ('dx', 'i1'), ('dy', 'i1'), ('kind', 'u1'), ('mode', 'u1')]
+    HEADER = 8
+
+    @classmethod
+    def layout(cls, entity_count):
+        """Byte offsets of (header, maze, pellets, entities) and the total size."""
+        cells = WIDTH * HEIGHT
+        maze = cls.HEADER * 8
+        pellets = maze + cells
+        entities = (pellets + cells + 7) // 8 * 8
+        return (0, maze, pellets, entities), entities + entity_count * 12
+
+    def __init__(self, sim, buffer=None):
+        if np is None:
+            raise RuntimeError("state views need numpy (pip install numpy)")
+        self.sim = sim
+        count = 2 + (sim.swarm_size or 5)  # player, ghosts, fruit
+        (header, maze, pellets, entities), size = self.layout(count)
+        self.buffer = buffer if buffer is not None else bytearray(size)
+        self.header = np.ndarray(self.HEADER, dtype='<i8', buffer=self.buffer, offset=header)
+        self.maze = np.ndarray((HEIGHT, WIDTH), dtype=np.uint8, buffer=self.buffer, offset=maze)
+        self.pellets = np.ndarray((HEIGHT, WIDTH), dtype=np.uint8, buffer=self.buffer, offset=pellets)
+        self.entities = np.ndarray(count, dtype=self.ENTITY_FIELDS, buffer=self.buffer, offset=entities)
+        self.header[:] = 0
+        self.header[6] = count
+        self.header[7] = self.VERSION
+        self.entities['kind'] = self.GHOST
+        self.entities['kind'][0] = self.PLAYER
+        self.entities['kind'][-1] = self.FRUIT
+        self.shown_tiles = None  # TileMap copied into maze
+        self.shown_pellets = None  # (PelletIndex, remaining) copied into pellets
+
+    def update(self):
+        sim = self.sim
+        header = self.header
+        header[1] += 1
+        header[2:6] = (sim.score, sim.lives, sim.level, self.STATES.index(sim.state))
+        if self.shown_tiles is not sim.tiles:
+            self.maze.reshape(-1)[:] = np.frombuffer(sim.tiles.attrs, dtype=np.uint8)
+            self.shown_tiles = sim.tiles
+        if self.shown_pellets != (sim.pellets, sim.pellets.remaining):
+            bits = np.frombuffer(sim.pellets.bits, dtype=np.uint8)
+            self.pellets.reshape(-1)[:] = np.unpackbits(bits, count=WIDTH * HEIGHT, bitorder='little')
+            self.shown_pellets = (sim.pellets, sim.pellets.remaining)
+        rows = self.entities
+        p = sim.player
+        rows[0] = (p.x, p.y, p.dir[0], p.dir[1], self.PLAYER, 0)
+        if sim.swarm is not None:
+            swarm = sim.swarm
+            ghosts = rows[1:-1]
+            ghosts['x'] = swarm.x
+            ghosts['y'] = swarm.y
+            ghosts['dx'] = swarm.dx
+            ghosts['dy'] = swarm.dy
+            ghosts['mode'] = swarm.mode
+        else:
+            modes = self.MODES
+            for i, g in enumerate(sim.ghosts, 1):
+                rows[i] = (g.x, g.y, g.dir[0], g.dir[1], self.GHOST, modes.get(g.mode, 0))
+        rows[-1] = (sim.fruit_x, sim.fruit_y, 0, 0, self.FRUIT, sim.fruit_active is not None)
+
+    @classmethod
+    def attach(cls, buffer):
+        """(header, maze, pellets, entities) views over a buffer written by another StateView."""
+        header = np.ndarray(cls.HEADER, dtype='<i8', buffer=buffer)
+        if header[7] != cls.VERSION:
+            raise ValueError(f"unsupported state layout version {header[7]}")
+        (_, maze, pellets, entities), _ = cls.layout(int(header[6]))
+        return (header,
+                np.ndarray((HEIGHT, WIDTH), dtype=np.uint8, buffer=buffer, offset=maze),
+                np.ndarray((HEIGHT, WIDTH), dtype=np.uint8, buffer=buffer, offset=pellets),
+                np.ndarray(int(header[6]), dtype=cls.ENTITY_FIELDS, buffer=buffer, offset=entities))
+
+class SharedState:
+    """Publishes a StateView through multiprocessing.shared_memory.
+
+    The header's seq field is a sequence lock: it is odd while publish() is
+    writing and advances by two per frame, so a reader (StateReader) that
+    sees the same even value before and after copying has a consistent frame.
+    """
+    def __init__(self, sim, name=None):
+        from multiprocessing import shared_memory
+        _, size = StateView.layout(2 + (sim.swarm_size or 5))
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = self.shm.name
+        self.view = StateView(sim, self.shm.buf)
+
+    def publish(self):
+        seq = self.view.header
+        seq[0] += 1
+        self.view.update()
+        seq[0] += 1
+
+    def close(self):
+        self.view = None  # drop the views before the mapping goes away
+        self.shm.close()
+        self.shm.unlink()
+
+class StateReader:
+    """Reads the frames a SharedState publishes, from any process on the machine."""
+    def __init__(self, name):
+        from multiprocessing import shared_memory
+        self.shm = shared_memory.SharedMemory(name=name)
+        self.header, self.maze, self.pellets, self.entities = StateView.attach(self.shm.buf)
+
+    def read(self):
+        """Copies of the latest complete frame: (header, maze, pellets, entities)."""
+        header = self.header
+        while True:
+            seq = int(header[0])
+            if seq & 1:
+                time.sleep(0)  # the writer is mid-frame
+                continue
+            copies = (header.copy(), self.maze.copy(), self.pellets.copy(), self.entities.copy())
+            if int(header[0]) == seq:
+                return copies
+
+    def close(self):
+        self.header = self.maze = self.pellets = self.entities = None
+        self.shm.close()
+
+
+class Game:
+    """Pygame front end: owns the window, sounds and fonts and drives a Simulation.
+
+    Only what the MENU screen needs (display, fonts, logo) is set up before the
+    first frame. Joystick, audio and gameplay sprites come up one per frame
+    afterwards (see startup_tasks), or all at once if a game starts first.
+    """
+    DIRTY_SWARM_LIMIT = 64  # bigger stress-mode swarms redraw the whole screen every frame
+    def __init__(self, swarm_size=0, audio_report=False, startup_budget_ms=None, startup_report=False,
+                 max_fps=240, seed=None, record_dir=None, trace_path=None, publish=None, capture=None,
+                 input_report=False, tile=TILE):
+        self.timeline = StartupTimeline()
+        self.max_fps = max_fps  # render rate cap, 0 for uncapped
+        self.startup_budget_ms = startup_budget_ms  # fail if the first frame takes longer
+        self.startup_report = startup_report
+        pygame.display.init()
+        pygame.font.init()
+        # Everything is drawn to `screen`, a framebuffer of `tile` pixels per maze
+        # tile, and scaled to the (resizable) window when the two differ in size
+        self.tile = tile
+        self.scale = tile / TILE  # framebuffer pixels per game pixel
+        self.width, self.height = WIDTH * tile, HEIGHT * tile
+        zoom = max(1, TILE // tile)  # open at about the classic window size
+        self.window = pygame.display.set_mode((self.width * zoom, self.height * zoom), pygame.RESIZABLE)
+        self.screen = None
+        self.layout_window()
+        pygame.display.set_caption("Open-Pac")
+        self.timeline.mark('display ready')
+        self.clock = pygame.time.Clock()
+        self.controls = Controls()
+        self.hs = HighScores()
+        self.joystick = None  # opened after the first frame
+        self.initials = ""
+        self.high_scores_timer = 0  # Timer for HIGH_SCORES auto-return to menu
+        # assets directory (where sounds/images live)
+        self.assets_dir = os.path.dirname(os.path.abspath(__file__))
+        # Music is streamed; effects decode in the background once the mixer is open
+        self.audio = Audio(self.assets_dir)
+        self.audio.preload('chomp', 'eatghost', 'death')
+        self.audio_report = audio_report
+
+        # Images are decoded once per process and shared between levels and respawns
+        self.assets = Assets.shared(self.assets_dir)
+        self.assets.sprite_size = (round((TILE-4) * self.scale),) * 2
+        self.assets.prefetch('thepac2.png', 'thepac.png')  # the biggest files, on their own thread
+
+        # Load logo image
+        self.logo_img = self.assets.image('openpac_logo.png', size=None)
+        if self.logo_img and self.scale != 1:
+            w, h = self.logo_img.get_size()
+            self.logo_img = pygame.transform.smoothscale(self.logo_img, (round(w * self.scale), round(h * self.scale)))
+
+        # Load arcade font
+        self.arcade_font_path = os.path.join(self.assets_dir, 'arcade.ttf')
+        size = lambda points: max(6, round(points * self.scale))
+        try:
+            self.arcade_font = pygame.font.Font(self.arcade_font_path, size(24))
+            self.arcade_font_large = pygame.font.Font(self.arcade_font_path, size(48))
+            self.arcade_font_small = pygame.font.Font(self.arcade_font_path, size(18))
+        except Exception:
+            self.arcade_font = pygame.font.Font(None, size(36))
+            self.arcade_font_large = pygame.font.Font(None, size(72))
+            self.arcade_font_small = pygame.font.Font(None, size(28))
+        self.text_cache = TextCache()
+        self.hud_key = None  # (score, lives, high) the HUD layer was rendered for
+        self.hud_layer = None
+        self.timeline.mark('menu assets loaded')
+
+        # All game rules live in the simulation; the front end only renders it.
+        # Sprites are attached by attach_sprites once they are loaded.
+        self.profiler = Profiler()
+        self.trace_path = trace_path  # export the profiler's Chrome trace here on exit
+        self.show_profiler = False  # F11 overlay
+        self.profiler_overlay = None  # rendered overlay, refreshed a few times a second
+        self.sim = Simulation(swarm_size=swarm_size, seed=seed, profiler=self.profiler)
+        self.fruit_images = {}
+        # Every tick's state in shared memory for other processes (see StateReader)
+        self.shared_state = SharedState(self.sim, publish) if publish else None
+        # (path, format, policy): record one frame per tick with a FrameCapture
+        self.capture = FrameCapture(capture[0], self.screen, *capture[1:]) if capture else None
+
+        # Input for the next simulation tick, gathered by handle_input
+        self.input = InputLayer(self.controls)
+        self.input_report = input_report
+        self.input_player = None  # Player the held direction was last sent to
+        self.input_dir = None
+        self.input_select = False
+        self.input_turbo = False
+        self.record_dir = record_dir  # save an InputLog of every game here
+        self.recording = None
+
+        # Pre-rendered maze layers, rebuilt whenever the simulation swaps in a new maze
+        self.layers_template = None  # MazeTemplate the maze layer shows
+        self.layers_pellets = None  # PelletIndex the pellet layer shows
+        self.maze_layer = None  # walls and door, drawn once per maze layout
+        self.background = None  # maze layer plus the dots, erased tile by tile as they are eaten
+        # Dirty-rectangle presentation (see draw): only what changed goes to the display
+        self.sprite_rects = []  # everything drawn over the background last frame
+        self.dirty_rects = []  # background changes (eaten dots) not yet on screen
+        self.drawn_state = None  # state of the last frame; a change redraws the whole screen
+        self.swarm_sprites = None  # stress-mode ghost sprites, built on first use
+
+        # Deferred startup, run one task per frame after the first one is shown
+        self.first_frame_shown = False
+        # (name, callable). The sprite files decode in the background meanwhile and
+        # each sprite is its own task, so no single frame prepares them all.
+        ghosts, fruit = range(len(GHOST_COLORS)), self.sim.fruit_types
+        self.assets.prefetch(*[f'ghost{i % 5 + 1}.png' for i in ghosts], *[f'{f}.png' for f in fruit])
+        self.startup_tasks = [('init_joystick', self.init_joystick), ('init_audio', self.init_audio)]
+        self.startup_tasks += [(f'ghost {i + 1} sprites', functools.partial(self.assets.ghost_sprites, i))
+                               for i in ghosts]
+        self.startup_tasks += [(f'{f} sprite', functools.partial(self.load_fruit, f)) for f in fruit]
+        self.startup_tasks += [('player sprites', self.assets.player_frames),
+                               ('attach_sprites', self.attach_sprites), ('load_paths', self.load_paths)]
+
+    def init_joystick(self):
+        pygame.joystick.init()
+        if pygame.joystick.get_count() > 0:
+            self.joystick = pygame.joystick.Joystick(0)
+
+    def init_audio(self):
+        self.audio.start()
+
+    def load_fruit(self, fruit):
+        self.fruit_images[fruit] = self.assets.image(f'{fruit}.png')
+
+    def attach_sprites(self):
+        self.sim.assets = self.assets  # used from the next reset_level on
+
+    def load_paths(self):
+        # The ghosts' path tables of every maze. On a cold cache each is a BFS of a
+        # few hundred ms; the thread keeps it out of any one frame or tick.
+        threading.Thread(target=MazeTemplate.prepare_paths, name='openpac-paths', daemon=True).start()
+
+    def advance_startup(self):
+        """Called after each presented frame until every deferred startup task has run."""
+        if not self.first_frame_shown:
+            self.first_frame_shown = True
+            first_frame_ms = self.timeline.mark('first frame')
+            if self.startup_budget_ms is not None and first_frame_ms > self.startup_budget_ms:
+                print(self.timeline.report(), file=sys.stderr)
+                raise StartupBudgetExceeded(
+                    f"first frame after {first_frame_ms:.0f} ms, budget is {self.startup_budget_ms:.0f} ms")
+            return
+        if self.startup_tasks:
+            name, task = self.startup_tasks.pop(0)
+            task()
+            self.timeline.mark(name)
+            if not self.startup_tasks:
+                self.startup_tasks = None
+                if self.startup_report:
+                    print(self.timeline.report())
+
+    def finish_startup(self):
+        """Run whatever deferred startup is left, e.g. when a game starts straight away."""
+        while self.startup_tasks:
+            self.advance_startup()
+
+    def layout_window(self):
+        """Fit the framebuffer into the window at the largest whole-number zoom, centered.
+
+        Windows smaller than the framebuffer get it scaled down to fit. When
+        the window is exactly the framebuffer's size it is drawn to directly.
+        """
+        self.window = pygame.display.get_surface()
+        size = self.window.get_size()
+        if size == (self.width, self.height):
+            self.screen = self.window
+        elif self.screen is None or self.screen is self.window:
+            self.screen = pygame.Surface((self.width, self.height)).convert()
+        self.zoom = min(size[0] // self.width, size[1] // self.height)
+        if self.zoom:
+            view = (self.width * self.zoom, self.height * self.zoom)
+        else:
+            fit = min(size[0] / self.width, size[1] / self.height)
+            view = (max(1, int(self.width * fit)), max(1, int(self.height * fit)))
+        self.view_rect = pygame.Rect((0, 0), view)
+        self.view_rect.center = (size[0] // 2, size[1] // 2)
+        self.view = None if self.screen is self.window else self.window.subsurface(self.view_rect)
+        self.window.fill(BLACK)
+        self.presented = None  # framebuffer contents last scaled to the window
+        self.drawn_state = None  # redraw and present everything
+
+    def present(self, rects=None):
+        """Show the framebuffer in the window: only `rects` of it, or all of it."""
+        if self.view is None:
+            if rects is None:
+                pygame.display.flip()
+            else:
+                pygame.display.update(rects)
+            return
+        if rects is None or not self.zoom:
+            pixels = self.screen.get_buffer().raw
+            if pixels == self.presented:
+                return  # nothing changed: the window still shows the last scaled frame
+            pygame.transform.scale(self.screen, self.view_rect.size, self.view)
+            if self.presented is None:
+                pygame.display.flip()  # also the borders, after a resize
+            else:
+                pygame.display.update(self.view_rect)
+            self.presented = pixels
+            return
+        # Whole-number zoom: every changed rectangle scales on its own to the same pixels
+        self.presented = b''
+        zoom, left, top = self.zoom, self.view_rect.x, self.view_rect.y
+        bounds = self.screen.get_rect()
+        updated = []
+        for rect in rects:
+            rect = rect.clip(bounds)
+            if rect.w and rect.h:
+                dest = pygame.Rect(left + rect.x * zoom, top + rect.y * zoom, rect.w * zoom, rect.h * zoom)
+                pygame.transform.scale(self.screen.subsurface(rect), dest.size, self.window.subsurface(dest))
+                updated.append(dest)
+        pygame.display.update(updated)
+
+    def build_maze_layers(self):
+        """Bake walls and door of the current layout and its remaining dots into background surfaces."""
+        sim = self.sim
+        t = self.tile
+        if self.layers_template is not sim.template:
+            self.maze_layer = pygame.Surface((self.width, self.height)).convert()
+            self.maze_layer.fill(BLACK)
+            for y, row in enumerate(sim.maze):
+                for x, cell in enumerate(row):
+                    if cell == '#' or cell == '-':
+                        pygame.draw.rect(self.maze_layer, BLUE, (x * t, y * t, t, t))
+            self.layers_template = sim.template
+        self.background = self.maze_layer.copy()
+        radius = max(1, round(2 * self.scale))
+        for x, y in sim.pellets.dots:
+            pygame.draw.circle(self.background, WHITE, (x * t + t//2, y * t + t//2), radius)
+        self.layers_pellets = sim.pellets
+        self.drawn_state = None  # new layout: redraw everything
+
+    def draw_swarm(self, swarm, alpha=1.0):
+        """Draw every stress-mode ghost with a single batched blit call."""
+        if self.swarm_sprites is None:
+            # One sprite per ghost color plus the frightened look last; circles without images
+            self.swarm_sprites = []
+            for i, color in enumerate(GHOST_COLORS + [(0, 0, 255)]):
+                frightened = i == len(GHOST_COLORS)
+                sprites = self.assets.ghost_sprites(0 if frightened else i)
+                if sprites:
+                    self.swarm_sprites.append(sprites[1 if frightened else 0])
+                    continue
+                size = self.assets.sprite_size[0]
+                sprite = pygame.Surface((size, size)).convert()
+                sprite.fill(BLACK)
+                sprite.set_colorkey(BLACK)
+                pygame.draw.circle(sprite, color, (size//2, size//2), size//2)
+                self.swarm_sprites.append(sprite)
+        kinds = np.where(swarm.mode == GhostSwarm.FRIGHTENED, len(GHOST_COLORS), swarm.color)
+        dx = swarm.x - swarm.prev_x
+        dy = swarm.y - swarm.prev_y
+        slide = (np.abs(dx) <= TILE) & (np.abs(dy) <= TILE)  # same teleport rule as interpolate()
+        x = np.where(slide, swarm.prev_x + dx * alpha, swarm.x)
+        y = np.where(slide, swarm.prev_y + dy * alpha, swarm.y)
+        left = ((x - TILE//2 + 2) * self.scale).astype(np.int64).tolist()
+        top = ((y - TILE//2 + 2) * self.scale).astype(np.int64).tolist()
+        sprites = [self.swarm_sprites[k] for k in kinds.tolist()]
+        return self.screen.blits(list(zip(sprites, zip(left, top))), doreturn=swarm.count <= self.DIRTY_SWARM_LIMIT)
+
+    def erase_pellet(self, x, y):
+        if self.background is not None:
+            rect = pygame.Rect(x * self.tile, y * self.tile, self.tile, self.tile)
+            self.background.blit(self.maze_layer, rect, rect)
+            self.dirty_rects.append(rect)
+
+    def play_event(self, event):
+        """Play the sound that goes with a simulation event."""
+        kind = event[0]
+        if kind == 'pellet':
+            self.audio.play('chomp')
+        elif kind == 'power_pellet':
+            self.audio.play_music('power')  # replaces the intro, restarts if already playing
+        elif kind == 'power_end':
+            self.audio.play_music('intro')
+        elif kind == 'ghost_eaten':
+            self.audio.play('eatghost')
+        elif kind == 'death':
+            self.audio.stop_music('power')
+            self.audio.play('death')
+        elif kind == 'respawn':
+            self.audio.play_music('intro')
+    
+    def handle_input(self):
+        """Read pending events; gameplay input is queued for the next update()."""
+        sim = self.sim
+        now = time.perf_counter()
+        for e in pygame.event.get():
+            if e.type == pygame.QUIT:
+                return False
+            if e.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.drawn_state = None  # the window contents were lost: redraw it whole
+                self.presented = None
+            if e.type == pygame.VIDEORESIZE:
+                self.layout_window()
+            if e.type == pygame.KEYDOWN and sim.state == 'ENTER_INITIALS':
+                if e.key == pygame.K_RETURN and len(self.initials) > 0:
+                    self.hs.add(self.initials.upper(), sim.score, sim.level)
+                    sim.state = 'HIGH_SCORES'
+                    self.high_scores_timer = FPS * 5  # Show for 5 seconds then return to menu
+                elif e.key == pygame.K_BACKSPACE:
+                    self.initials = self.initials[:-1]
+                elif e.unicode.isalpha() and len(self.initials) < 3:
+                    self.initials += e.unicode
+                continue
+            if e.type == pygame.KEYDOWN:
+                # Global/GUI keys
+                if e.key == pygame.K_F11:
+                    self.show_profiler = not self.show_profiler
+                    self.profiler_overlay = None
+                elif e.key == pygame.K_F10:
+                    print(f"profiler trace written to {self.export_trace()}")
+                elif e.key == pygame.K_F12 and sim.state == 'PLAYING':
+                    # Toggle 5x speed test mode
+                    self.input_turbo = not self.input_turbo
+            for action, pressed in self.input.translate(e):
+                if action in InputLayer.DIRECTIONS:
+                    direction = self.input.press(action, pressed, now)
+                    if direction is not None and sim.state == 'PLAYING':
+                        self.input_dir = direction
+                        self.input.request(now)
+                elif not pressed:
+                    continue
+                elif action == 'scores':
+                    self.leave_game('HIGH_SCORES')
+                elif action == 'menu':
+                    if sim.state in ('PLAYING', 'HIGH_SCORES', 'GAME_OVER'):
+                        self.leave_game('MENU')
+                elif action == 'select':
+                    if sim.state == 'MENU':
+                        self.finish_startup()
+                        sim.new_game()
+                        # Play intro music if available
+                        self.audio.play_music('intro')
+                        self.start_recording()
+                    elif sim.state in ('READY', 'LEVEL_COMPLETE'):
+                        self.input_select = True  # applied by the next sim.step
+        return True
     
-    def draw(self):
-        self.screen.fill(BLACK)
+    def leave_game(self, state):
+        """Switch to a screen outside the game, saving a recording of the game left first."""
+        if self.recording is not None:
+            self.save_recording()  # while sim still holds the state its replay ends in
+        self.sim.state = state
+
+    def start_recording(self):
+        if self.record_dir:
+            self.recording = InputLog(self.sim.seed, self.sim.swarm_size)
+
+    def save_recording(self):
+        os.makedirs(self.record_dir, exist_ok=True)
+        # Timestamped, so games with a fixed --seed don't overwrite each other
+        stem = os.path.join(self.record_dir, f"openpac-{self.recording.seed}-{time.strftime('%Y%m%d-%H%M%S')}")
+        path, n = f"{stem}.json", 1
+        while os.path.exists(path):
+            n += 1
+            path = f"{stem}-{n}.json"
+        self.recording.save(path, self.sim)
+        self.recording = None
+
+    def snapshot_positions(self):
+        """Remember where everything is before a tick so draw() can interpolate."""
+        sim = self.sim
+        for entity in [sim.player] + sim.ghosts:
+            entity.prev_x, entity.prev_y = entity.x, entity.y
+        if sim.swarm is not None:
+            np.copyto(sim.swarm.prev_x, sim.swarm.x)
+            np.copyto(sim.swarm.prev_y, sim.swarm.y)
+
+    def update(self):
+        """Advance the game by one fixed 1/FPS tick."""
+        self.snapshot_positions()
+        direction, select, turbo = self.input_dir, self.input_select, self.input_turbo
+        self.input_dir, self.input_select, self.input_turbo = None, False, False
+        if self.sim.state == 'PLAYING' and self.sim.player is not self.input_player:
+            # New player (game start, respawn, next level): re-send a direction held through it
+            self.input_player = self.sim.player
+            if direction is None:
+                direction = self.input.held()
+        if self.recording is not None:
+            if self.sim.state in ('PLAYING', 'READY', 'DYING', 'LEVEL_COMPLETE'):
+                self.recording.inputs.append(encode_input(direction, select, turbo))
+            else:
+                self.save_recording()  # the game is over
+        # Handle HIGH_SCORES state - auto-return to menu after timer expires
+        if self.sim.state == 'HIGH_SCORES' and self.high_scores_timer > 0:
+            self.high_scores_timer -= 1
+            if self.high_scores_timer <= 0:
+                self.sim.state = 'MENU'
+                self.initials = ""
+            return
         
-        if self.state in ['PLAYING', 'READY', 'LEVEL_COMPLETE', 'DYING']:
-            # Draw maze
-            for y, row in enumerate(self.maze):
-                for x, cell in enumerate(row):
-                    px, py = x * TILE, y * TILE
-                    if cell == '#':
-                        pygame.draw.rect(self.screen, BLUE, (px, py, TILE, TILE))
-                    elif cell == '-':
-                        pygame.draw.rect(self.screen, BLUE, (px, py, TILE, TILE))
-                    elif cell == '.':
-                        pygame.draw.circle(self.screen, WHITE, (px + TILE//2, py + TILE//2), 2)
-                    elif cell == 'o':
-                        # Flash power pellets (visible for 10 frames, hidden for 5)
-                        if (self.flash_timer // 10) % 2 == 0:
-                            pygame.draw.circle(self.screen, WHITE, (px + TILE//2, py + TILE//2), 6)
+        for event in self.sim.step(direction, select, turbo):
+            self.play_event(event)
+            if event[0] in ('pellet', 'power_pellet'):
+                self.erase_pellet(event[1], event[2])
+        self.input.ticked(direction, self.sim.player)
+        if self.sim.state in ('PLAYING', 'READY', 'LEVEL_COMPLETE'):
+            self.sim.player.animate()
+    
+    def draw(self, alpha=1.0):
+        """Render the current state; `alpha` is how far we are between the last two ticks."""
+        sim = self.sim
+        prof = self.profiler
+        t = prof.now()
+        in_maze = sim.state in ['PLAYING', 'READY', 'LEVEL_COMPLETE', 'DYING']
+        screen = self.screen
+        S, T = self.scale, self.tile
+        if in_maze and self.layers_pellets is not sim.pellets:
+            self.build_maze_layers()
+        # In the maze only the sprites move: put the background back where they
+        # were, draw them at their new places and present just those rectangles.
+        # Anything else (other screens, state changes, big swarms) is redrawn whole.
+        full = (not in_maze or sim.state != self.drawn_state
+                or (sim.swarm is not None and sim.swarm.count > self.DIRTY_SWARM_LIMIT))
+        self.drawn_state = sim.state
+        rects = []  # what this frame draws over the background
+        if not in_maze:
+            screen.fill(BLACK)  # otherwise the opaque maze layer covers the screen
+        elif full:
+            screen.blit(self.background, (0, 0))
+        else:
+            for rect in self.sprite_rects + self.dirty_rects:
+                screen.blit(self.background, rect, rect)
+        
+        if in_maze:
+            # Flash power pellets (visible for 10 frames, hidden for 5)
+            if (sim.flash_timer // 10) % 2 == 0:
+                for x, y in sim.pellets.power:
+                    rects.append(pygame.draw.circle(screen, WHITE, (x * T + T//2, y * T + T//2), max(1, round(6 * S))))
+            t = prof.lap('draw maze', t)
             
             # Draw player (with death spin if dying)
-            if self.state == 'DYING':
+            if sim.state == 'DYING':
                 # Draw spinning Pac-Man
-                if self.player.img:
-                    rotated_img = pygame.transform.rotate(self.player.img, self.death_spin_angle)
-                    rect = rotated_img.get_rect(center=(int(self.player.x), int(self.player.y)))
-                    self.screen.blit(rotated_img, rect)
+                if sim.player.img:
+                    rotated_img = pygame.transform.rotate(sim.player.img, sim.death_spin_angle)
+                    rect = rotated_img.get_rect(center=(int(sim.player.x * S), int(sim.player.y * S)))
+                    rects.append(screen.blit(rotated_img, rect))
                 else:
-                    pygame.draw.circle(self.screen, YELLOW, (int(self.player.x), int(self.player.y)), TILE//2 - 4)
+                    rects.append(pygame.draw.circle(screen, YELLOW, (int(sim.player.x * S), int(sim.player.y * S)), int((TILE//2 - 4) * S)))
             else:
-                self.player.draw(self.screen)
+                rects.append(sim.player.draw(screen, alpha, S))
             
             # Only draw ghosts if not dying
-            if self.state != 'DYING':
-                for g in self.ghosts:
-                    g.draw(self.screen)
+            if sim.state != 'DYING':
+                for g in sim.ghosts:
+                    rects.append(g.draw(screen, alpha, S))
+                if sim.swarm is not None:
+                    rects.extend(self.draw_swarm(sim.swarm, alpha) or ())
             
             # Draw fruit if active
-            if self.fruit_active and self.fruit_images.get(self.fruit_active):
-                fruit_img = self.fruit_images[self.fruit_active]
-                self.screen.blit(fruit_img, (self.fruit_x - TILE//2 + 2, self.fruit_y - TILE//2 + 2))
-            elif self.fruit_active:
+            if sim.fruit_active and self.fruit_images.get(sim.fruit_active):
+                fruit_img = self.fruit_images[sim.fruit_active]
+                rects.append(screen.blit(fruit_img, ((sim.fruit_x - TILE//2 + 2) * S, (sim.fruit_y - TILE//2 + 2) * S)))
+            elif sim.fruit_active:
                 # Fallback: draw a colored circle if image not loaded
-                pygame.draw.circle(self.screen, (255, 0, 100), (int(self.fruit_x), int(self.fruit_y)), TILE//2 - 4)
-            
-            # HUD - use arcade font, evenly spaced across screen
-            # Left: Score | Center: Lives | Right: High Score
-            score_txt = self.arcade_font_small.render(f"SCORE: {self.score}", True, WHITE)
-            self.screen.blit(score_txt, (20, 8))
+                rects.append(pygame.draw.circle(screen, (255, 0, 100), (int(sim.fruit_x * S), int(sim.fruit_y * S)), int((TILE//2 - 4) * S)))
+            t = prof.lap('draw entities', t)
             
-            lives_txt = self.arcade_font_small.render(f"LIVES: {self.lives}", True, WHITE)
-            lives_rect = lives_txt.get_rect(center=(SCREEN_WIDTH//2, 16))
-            self.screen.blit(lives_txt, lives_rect)
+            # HUD - re-rendered only when one of its values changes
+            hud_key = (sim.score, sim.lives, self.hs.get_high())
+            if hud_key != self.hud_key:
+                self.build_hud(*hud_key)
+            rects.append(screen.blit(self.hud_layer, (0, 0)))
             
-            hs_txt = self.arcade_font_small.render(f"HIGH: {self.hs.get_high()}", True, YELLOW)
-            hs_rect = hs_txt.get_rect(right=SCREEN_WIDTH - 20, top=8)
-            self.screen.blit(hs_txt, hs_rect)
-            
-            if self.state == 'READY':
-                txt = self.arcade_font_large.render("READY!", True, YELLOW)
-                txt_rect = txt.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
-                self.screen.blit(txt, txt_rect)
-            elif self.state == 'LEVEL_COMPLETE':
-                txt = self.arcade_font_large.render("LEVEL COMPLETE!", True, YELLOW)
-                txt_rect = txt.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
-                self.screen.blit(txt, txt_rect)
+            if sim.state == 'READY':
+                txt = self.text_cache.render(self.arcade_font_large, "READY!", YELLOW)
+                txt_rect = txt.get_rect(center=(self.width//2, self.height//2))
+                rects.append(screen.blit(txt, txt_rect))
+            elif sim.state == 'LEVEL_COMPLETE':
+                txt = self.text_cache.render(self.arcade_font_large, "LEVEL COMPLETE!", YELLOW)
+                txt_rect = txt.get_rect(center=(self.width//2, self.height//2))
+                rects.append(screen.blit(txt, txt_rect))
         
-        elif self.state == 'MENU':
+        elif sim.state == 'MENU':
             # Draw logo image or fallback to text
             if self.logo_img:
-                logo_rect = self.logo_img.get_rect(center=(SCREEN_WIDTH//2, 180))
+                logo_rect = self.logo_img.get_rect(center=(self.width//2, int(180 * S)))
                 self.screen.blit(self.logo_img, logo_rect)
             else:
-                txt = self.arcade_font_large.render("OPEN-PAC", True, YELLOW)
-                txt_rect = txt.get_rect(center=(SCREEN_WIDTH//2, 180))
+                txt = self.text_cache.render(self.arcade_font_large, "OPEN-PAC", YELLOW)
+                txt_rect = txt.get_rect(center=(self.width//2, int(180 * S)))
                 self.screen.blit(txt, txt_rect)
             
-            txt = self.arcade_font.render("Press ENTER to Start", True, WHITE)
-            txt_rect = txt.get_rect(center=(SCREEN_WIDTH//2, 350))
+            txt = self.text_cache.render(self.arcade_font, "Press ENTER to Start", WHITE)
+            txt_rect = txt.get_rect(center=(self.width//2, int(350 * S)))
             self.screen.blit(txt, txt_rect)
             
-            txt = self.arcade_font.render("Press END for High Scores", True, WHITE)
-            txt_rect = txt.get_rect(center=(SCREEN_WIDTH//2, 400))
+            txt = self.text_cache.render(self.arcade_font, "Press END for High Scores", WHITE)
+            txt_rect = txt.get_rect(center=(self.width//2, int(400 * S)))
             self.screen.blit(txt, txt_rect)
         
-        elif self.state == 'ENTER_INITIALS':
-            txt = self.arcade_font_large.render("ENTER INITIALS", True, YELLOW)
-            txt_rect = txt.get_rect(center=(SCREEN_WIDTH//2, 200))
+        elif sim.state == 'ENTER_INITIALS':
+            txt = self.text_cache.render(self.arcade_font_large, "ENTER INITIALS", YELLOW)
+            txt_rect = txt.get_rect(center=(self.width//2, int(200 * S)))
             self.screen.blit(txt, txt_rect)
             
-            txt = self.arcade_font_large.render(self.initials + "_" * (3 - len(self.initials)), True, WHITE)
-            txt_rect = txt.get_rect(center=(SCREEN_WIDTH//2, 350))
+            txt = self.text_cache.render(self.arcade_font_large, self.initials + "_" * (3 - len(self.initials)), WHITE)
+            txt_rect = txt.get_rect(center=(self.width//2, int(350 * S)))
             self.screen.blit(txt, txt_rect)
         
-        elif self.state == 'HIGH_SCORES':
-            txt = self.arcade_font_large.render("HIGH SCORES", True, YELLOW)
-            txt_rect = txt.get_rect(center=(SCREEN_WIDTH//2, 70))
+        elif sim.state == 'HIGH_SCORES':
+            txt = self.text_cache.render(self.arcade_font_large, "HIGH SCORES", YELLOW)
+            txt_rect = txt.get_rect(center=(self.width//2, int(70 * S)))
             self.screen.blit(txt, txt_rect)
             
             y = 150
             for i, entry in enumerate(self.hs.scores[:10], 1):
-                txt = self.arcade_font.render(f"{i}. {entry['initials']} - {entry['score']}", True, WHITE)
-                txt_rect = txt.get_rect(center=(SCREEN_WIDTH//2, y))
+                txt = self.text_cache.render(self.arcade_font, f"{i}. {entry['initials']} - {entry['score']}", WHITE)
+                txt_rect = txt.get_rect(center=(self.width//2, int(y * S)))
                 self.screen.blit(txt, txt_rect)
                 y += 45
             
             # Show escape hint
-            txt = self.arcade_font_small.render("Press ESC to return to menu", True, (150, 150, 150))
-            txt_rect = txt.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT - 50))
+            txt = self.text_cache.render(self.arcade_font_small, "Press ESC to return to menu", (150, 150, 150))
+            txt_rect = txt.get_rect(center=(self.width//2, self.height - int(50 * S)))
             self.screen.blit(txt, txt_rect)
         
-        elif self.state == 'GAME_OVER':
-            txt = self.arcade_font_large.render("GAME OVER", True, (255, 0, 0))
-            txt_rect = txt.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
+        elif sim.state == 'GAME_OVER':
+            txt = self.text_cache.render(self.arcade_font_large, "GAME OVER", (255, 0, 0))
+            txt_rect = txt.get_rect(center=(self.width//2, self.height//2))
             self.screen.blit(txt, txt_rect)
+        t = prof.lap('hud', t)
         
-        pygame.display.flip()
+        if self.show_profiler:
+            rects.append(self.draw_profiler())
+            t = prof.lap('profiler overlay', t)
+        if full:
+            self.present()
+        else:
+            self.present(self.sprite_rects + self.dirty_rects + rects)
+        self.sprite_rects = rects
+        self.dirty_rects = []
+        prof.lap('display.flip', t)
+
+    def build_hud(self, score, lives, high):
+        """Render the score, lives and high score strip along the top of the maze."""
+        S = self.scale
+        self.hud_layer = pygame.Surface((self.width, self.tile), pygame.SRCALPHA)
+        # Left: Score | Center: Lives | Right: High Score
+        score_txt = self.arcade_font_small.render(f"SCORE: {score}", True, WHITE)
+        self.hud_layer.blit(score_txt, (int(20 * S), int(8 * S)))
+        
+        lives_txt = self.arcade_font_small.render(f"LIVES: {lives}", True, WHITE)
+        lives_rect = lives_txt.get_rect(center=(self.width//2, int(16 * S)))
+        self.hud_layer.blit(lives_txt, lives_rect)
+        
+        hs_txt = self.arcade_font_small.render(f"HIGH: {high}", True, YELLOW)
+        hs_rect = hs_txt.get_rect(right=self.width - int(20 * S), top=int(8 * S))
+        self.hud_layer.blit(hs_txt, hs_rect)
+        self.hud_key = (score, lives, high)
+
+    def draw_profiler(self):
+        """Overlay the per-phase frame timings of the last second."""
+        prof = self.profiler
+        if self.profiler_overlay is None or prof.frame % 15 == 0:
+            rows, (avg_ms, max_ms) = prof.summary()
+            font = self.arcade_font_small
+            lines = [(f"FRAME {avg_ms:6.2f} AVG {max_ms:6.2f} MAX  OF {prof.BUDGET_MS:.1f} MS",
+                      (255, 0, 0) if max_ms > prof.BUDGET_MS else YELLOW)]
+            for name, phase_avg, phase_max in rows[:16]:
+                lines.append((f"{name[:18]:<18} {phase_avg:6.2f} {phase_max:6.2f}",
+                              (255, 0, 0) if phase_max > prof.BUDGET_MS else WHITE))
+            height = font.get_linesize() + 2
+            self.profiler_overlay = pygame.Surface((self.width - int(40 * self.scale), height * len(lines) + 12), pygame.SRCALPHA)
+            self.profiler_overlay.fill((0, 0, 0, 190))
+            for i, (line, color) in enumerate(lines):
+                self.profiler_overlay.blit(font.render(line, True, color), (6, 6 + i * height))
+        return self.screen.blit(self.profiler_overlay, (int(20 * self.scale), int(40 * self.scale)))
+
+    def export_trace(self, path=None):
+        path = path or self.trace_path or f"openpac-trace-{time.strftime('%Y%m%d-%H%M%S')}.json"
+        self.profiler.export_trace(path)
+        return path
     
     def run(self):
+        # Fixed timestep: the simulation always ticks at FPS, rendering runs as
+        # fast as max_fps allows and interpolates between the last two ticks
+        tick = 1.0 / FPS
+        accumulator = 0.0
+        previous = time.perf_counter()
         running = True
         while running:
+            now = time.perf_counter()
+            # Catch up after a hitch, but never by more than MAX_CATCH_UP seconds
+            accumulator += min(now - previous, MAX_CATCH_UP)
+            previous = now
+            t = self.profiler.now()
             running = self.handle_input()
-            self.update()
-            self.draw()
-            self.clock.tick(FPS)
+            self.profiler.lap('handle_input', t)
+            ticked = accumulator >= tick
+            while accumulator >= tick:
+                self.update()
+                if self.shared_state is not None:
+                    self.shared_state.publish()
+                accumulator -= tick
+            self.draw(accumulator / tick)
+            self.input.presented(time.perf_counter())
+            if self.capture is not None and ticked:
+                # At most one frame per tick, so the video plays at FPS whatever max_fps is
+                t = self.profiler.now()
+                self.capture.add(self.screen)
+                self.profiler.lap('capture', t)
+            if self.startup_tasks is not None:
+                self.advance_startup()
+            self.profiler.next_frame()
+            self.clock.tick(self.max_fps)
+        if self.trace_path:
+            self.export_trace()
+        if self.recording is not None:
+            self.save_recording()
+        if self.audio_report:
+            print(self.audio.memory_report())
+        if self.shared_state is not None:
+            self.shared_state.close()
+        if self.capture is not None:
+            print(self.capture.close())
+        if self.input_report:
+            print(self.input.report())
+        self.hs.close()
         pygame.quit()
 
 if __name__ == "__main__":
-    Game().run()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Open-Pac")
+    parser.add_argument('--ghosts', type=int, default=0, metavar='N',
+                        help="stress mode: run N vectorized ghosts instead of the classic five (needs numpy)")
+    parser.add_argument('--audio-report', action='store_true',
+                        help="print the memory held by decoded sound effects on exit")
+    parser.add_argument('--startup-report', action='store_true',
+                        help="print the startup timeline once every subsystem is up")
+    parser.add_argument('--startup-budget', type=float, default=None, metavar='MS',
+                        help="exit with an error if the first frame takes longer than MS milliseconds")
+    parser.add_argument('--max-fps', type=int, default=240, metavar='N',
+                        help="cap the render rate (0 = uncapped); the game itself always runs at 60 Hz")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="seed every game's random streams with this value")
+    parser.add_argument('--record', metavar='DIR',
+                        help="save an input log of every game to DIR for later --replay")
+    parser.add_argument('--replay', metavar='FILE',
+                        help="re-run a recorded game headless at full speed and check it is bit-exact")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="write the profiler's last frames as a Chrome trace to FILE on exit")
+    parser.add_argument('--publish', metavar='NAME',
+                        help="publish the game state every tick to the shared memory block NAME (needs numpy)")
+    parser.add_argument('--capture', metavar='PATH',
+                        help="record the screen at 60 FPS to PATH (a raw pixel file, or a directory for --capture-format png)")
+    parser.add_argument('--capture-format', choices=FrameCapture.FORMATS, default='raw',
+                        help="raw: one file of 32-bit frames described by PATH.json; png: numbered PNG files")
+    parser.add_argument('--capture-policy', choices=FrameCapture.POLICIES, default='drop',
+                        help="when the writer falls behind, drop frames (default) or make the game wait")
+    parser.add_argument('--input-report', action='store_true',
+                        help="print input-to-display latency, turn waits and missed turns on exit")
+    parser.add_argument('--tile', type=int, default=TILE, metavar='PX',
+                        help=f"render at PX pixels per maze tile and scale to the window (default {TILE}; 8 = arcade resolution)")
+    args = parser.parse_args()
+    if args.tile < 4:
+        parser.error("--tile must be at least 4")
+    if args.replay:
+        try:
+            log = InputLog.load(args.replay)
+        except (OSError, ValueError) as e:
+            sys.exit(f"openpac: {e}")
+        start = time.perf_counter()
+        sim = log.replay()
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        match = sim.state_hash() == log.final_hash
+        print(f"{args.replay}: {len(log.inputs)} ticks in {elapsed:.2f} s ({len(log.inputs) / elapsed:.0f} ticks/s), "
+              f"score {sim.score}, level {sim.level}: {'bit-exact' if match else 'DIVERGED'}")
+        sys.exit(0 if match else 1)
+    try:
+        Game(swarm_size=args.ghosts, audio_report=args.audio_report,
+             startup_budget_ms=args.startup_budget, startup_report=args.startup_report,
+             max_fps=args.max_fps, seed=args.seed, record_dir=args.record, trace_path=args.trace,
+             publish=args.publish, input_report=args.input_report, tile=args.tile,
+             capture=(args.capture, args.capture_format, args.capture_policy) if args.capture else None).run()
+    except StartupBudgetExceeded as e:
+        pygame.quit()
+        sys.exit(f"openpac: {e}")
@@ -0,0 +1,192 @@
+"""Batch runner for tuning the difficulty curve.
+
+Plays headless games across a process pool for every combination of
+difficulty curve, bot policy and seed, and prints a summary of how long the
+bots survive, how far they get and where they die:
+
+    python openpac_batch.py --games 200 --policy greedy --policy flee \
+        --curve default --curve fast:speed_step=0.08,frightened_step=1
+"""
+import os
+import sys
+import json
+import time
+import random
+import multiprocessing
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import openpac
+from openpac import TILE, FPS, EXIT_DIRS
+
+
+def random_policy(sim, rng, memory):
+    """Random walk: pick a new direction every half second."""
+    if sim.flash_timer % 30 == 0 or memory.get('dir') is None:
+        memory['dir'] = rng.choice(openpac.INPUT_DIRS[1:])
+    return memory['dir']
+
+
+def nearest_pellet_step(sim, tx, ty):
+    """First step of a shortest path from (tx, ty) to the nearest remaining pellet."""
+    nav, pellets = sim.nav, sim.pellets
+    w = nav.width
+    start = (tx % w, ty)
+    first = {start: None}
+    frontier = [start]
+    while frontier:
+        reached = []
+        for x, y in frontier:
+            for d in EXIT_DIRS[nav.player_exits(x, y)]:
+                nxt = ((x + d[0]) % w, y + d[1])
+                if nxt in first:
+                    continue
+                first[nxt] = first[(x, y)] or d
+                if nxt in pellets:
+                    return first[nxt]
+                reached.append(nxt)
+        frontier = reached
+    return None
+
+
+def greedy_policy(sim, rng, memory):
+    """Head for the nearest pellet, ignoring the ghosts."""
+    p = sim.player
+    tile = (int(p.x // TILE), int(p.y // TILE))
+    if memory.get('tile') != tile:
+        memory['tile'] = tile
+        memory['dir'] = nearest_pellet_step(sim, *tile) or rng.choice(openpac.INPUT_DIRS[1:])
+    return memory['dir']
+
+
+def flee_policy(sim, rng, memory, danger=5):
+    """Greedy, but when a ghost is within `danger` tiles take the exit furthest from it."""
+    p = sim.player
+    tx, ty = int(p.x // TILE), int(p.y // TILE)
+    if memory.get('tile') == (tx, ty):
+        return memory['dir']
+    memory['tile'] = (tx, ty)
+    paths = sim.paths
+    hunters = [paths.tile(int(g.x // TILE), int(g.y // TILE)) for g in sim.ghosts
+               if g.mode in ('active', 'leaving')]
+    here = paths.tile(tx, ty)
+    if hunters and min(paths.distance(g, here) for g in hunters) <= danger:
+        exits = EXIT_DIRS[sim.nav.player_exits(tx, ty)] or openpac.INPUT_DIRS[1:]
+        memory['dir'] = max(exits, key=lambda d: min(
+            paths.distance(g, paths.tile(tx + d[0], ty + d[1])) for g in hunters))
+    else:
+        memory['dir'] = nearest_pellet_step(sim, tx, ty) or rng.choice(openpac.INPUT_DIRS[1:])
+    return memory['dir']
+
+
+POLICIES = {'random': random_policy, 'greedy': greedy_policy, 'flee': flee_policy}
+
+
+def parse_curve(spec):
+    """'name:key=value,...' (or just 'name' for the defaults) -> (name, DifficultyCurve)."""
+    name, _, params = spec.partition(':')
+    values = {}
+    for item in filter(None, params.split(',')):
+        key, _, value = item.partition('=')
+        number = float(value)
+        values[key.strip()] = int(number) if number.is_integer() else number
+    return name, openpac.DifficultyCurve(**values)
+
+
+def play(job):
+    """Play one headless game; runs in a worker process."""
+    curve_name, curve_params, policy_name, seed, max_ticks = job
+    sim = openpac.Simulation(seed=seed, curve=openpac.DifficultyCurve(**curve_params))
+    sim.new_game()
+    policy = POLICIES[policy_name]
+    rng = random.Random(seed)
+    memory = {}
+    deaths = {}
+    ticks = 0
+    while ticks < max_ticks and sim.state not in ('GAME_OVER', 'ENTER_INITIALS'):
+        direction = policy(sim, rng, memory) if sim.state == 'PLAYING' else None
+        for event in sim.step(direction, select=sim.state == 'LEVEL_COMPLETE'):
+            if event[0] == 'death':
+                deaths[sim.level] = deaths.get(sim.level, 0) + 1
+            elif event[0] == 'respawn':
+                memory.clear()
+        ticks += 1
+    return {
+        'curve': curve_name, 'policy': policy_name, 'seed': seed,
+        'ticks': ticks, 'level': sim.level, 'score': sim.score,
+        'deaths': deaths, 'finished': sim.state in ('GAME_OVER', 'ENTER_INITIALS'),
+    }
+
+
+def summarize(results):
+    """Aggregate per (curve, policy)."""
+    groups = {}
+    for r in results:
+        groups.setdefault((r['curve'], r['policy']), []).append(r)
+    rows = []
+    for (curve, policy), games in groups.items():
+        n = len(games)
+        levels = [g['level'] for g in games]
+        deaths = {}
+        for g in games:
+            for level, count in g['deaths'].items():
+                deaths[int(level)] = deaths.get(int(level), 0) + count
+        rows.append({
+            'curve': curve, 'policy': policy, 'games': n,
+            'survival_s': sum(g['ticks'] for g in games) / n / FPS,
+            'level_mean': sum(levels) / n, 'level_max': max(levels),
+            'score_mean': sum(g['score'] for g in games) / n,
+            'deaths_per_level': {level: deaths[level] / n for level in sorted(deaths)},
+            'timed_out': sum(1 for g in games if not g['finished']),
+        })
+    rows.sort(key=lambda row: (row['curve'], row['policy']))
+    return rows
+
+
+def format_table(rows, max_levels=6):
+    lines = [f"{'curve':<12} {'policy':<8} {'games':>5} {'surv s':>7} {'lvl':>5} {'max':>4} {'score':>8}  deaths/game by level"]
+    for row in rows:
+        deaths = ' '.join(f"L{level}:{avg:.2f}" for level, avg in list(row['deaths_per_level'].items())[:max_levels])
+        lines.append(f"{row['curve']:<12} {row['policy']:<8} {row['games']:>5} {row['survival_s']:>7.1f} "
+                     f"{row['level_mean']:>5.2f} {row['level_max']:>4} {row['score_mean']:>8.0f}  {deaths}")
+    return '\n'.join(lines)
+
+
+def run(curves, policies, games, first_seed=0, max_ticks=10 * 60 * FPS, processes=None):
+    jobs = [(name, curve.as_dict(), policy, first_seed + i, max_ticks)
+            for name, curve in curves for policy in policies for i in range(games)]
+    # Build (or load) every maze template once here, so forked workers share it
+    openpac.MazeTemplate.prepare_paths()
+    with multiprocessing.Pool(processes) as pool:
+        return list(pool.imap_unordered(play, jobs, chunksize=max(1, len(jobs) // (8 * (processes or os.cpu_count() or 1)))))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Open-Pac difficulty sweep")
+    parser.add_argument('--curve', action='append', metavar='NAME[:KEY=VALUE,...]',
+                        help=f"difficulty curve to test, repeatable (keys: {', '.join(openpac.DifficultyCurve.DEFAULTS)})")
+    parser.add_argument('--policy', action='append', choices=sorted(POLICIES),
+                        help="bot policy, repeatable (default: greedy)")
+    parser.add_argument('--games', type=int, default=50, help="games per curve and policy")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first game")
+    parser.add_argument('--minutes', type=float, default=10, help="game-time limit per game")
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--json', metavar='FILE', help="write the summary and every game's result to FILE")
+    args = parser.parse_args()
+    try:
+        curves = [parse_curve(spec) for spec in args.curve or ['default']]
+    except ValueError as e:
+        parser.error(str(e))
+
+    start = time.perf_counter()
+    results = run(curves, args.policy or ['greedy'], args.games, args.seed,
+                  int(args.minutes * 60 * FPS), args.processes)
+    elapsed = time.perf_counter() - start
+    rows = summarize(results)
+    print(format_table(rows))
+    print(f"{len(results)} games, {sum(r['ticks'] for r in results) / FPS / 3600:.1f} h of play in {elapsed:.1f} s",
+          file=sys.stderr)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'summary': rows, 'games': results}, f, indent=2)
@@ -0,0 +1,202 @@
+"""Frame-time benchmark for Open-Pac.
+
+Runs scripted scenarios through Game.update and Game.draw under the SDL dummy
+drivers and reports p50/p95/p99 per scenario. Results can be written as JSON
+and compared against a stored baseline to catch frame-time regressions:
+
+    python openpac_bench.py --json baseline.json
+    python openpac_bench.py --baseline baseline.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import platform
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+import openpac
+
+RESULTS_VERSION = 1
+BENCH_SEED = 2024  # Simulation and scripted input seed, so every run plays the same frames
+
+
+def start_level(game, level):
+    sim = game.sim
+    sim.new_game()
+    sim.level = level
+    sim.reset_level()
+
+
+def setup_frightened(game):
+    start_level(game, 0)
+
+
+def keep_frightened(game):
+    # Power pellet storm: re-frighten every ghost whenever the effect runs out
+    sim = game.sim
+    if not sim.power_active:
+        for g in sim.ghosts:
+            if g.mode not in ('house', 'eaten'):
+                g.mode = 'frightened'
+                g.frightened_timer = sim.frightened_duration
+                g.speed = max(0.8, g.base_speed * 0.6)
+        if sim.swarm is not None:
+            sim.swarm.frighten(sim.frightened_duration)
+        sim.power_active = True
+    sim.lives = 3  # a caught player must not end the run
+
+
+def setup_dying(game):
+    start_level(game, 0)
+    game.sim.state = 'DYING'
+
+
+def keep_dying(game):
+    sim = game.sim
+    sim.state = 'DYING'
+    if sim.death_timer >= 89:
+        sim.death_timer = 0  # keep spinning instead of respawning
+
+
+def setup_high_scores(game):
+    game.sim.state = 'HIGH_SCORES'
+    game.high_scores_timer = 10 ** 9
+
+
+def keep_playing(game):
+    sim = game.sim
+    sim.lives = 3
+    if sim.state in ('READY', 'LEVEL_COMPLETE'):
+        game.input_select = True
+    elif sim.state not in ('PLAYING', 'DYING'):
+        sim.new_game()
+
+
+# name -> (setup, called before every tick)
+SCENARIOS = {}
+for _i in range(len(openpac.BASE_MAZES)):
+    SCENARIOS[f'maze-{_i}'] = (lambda game, level=_i: start_level(game, level), keep_playing)
+SCENARIOS['level-20'] = (lambda game: start_level(game, 20), keep_playing)
+SCENARIOS['frightened-storm'] = (setup_frightened, keep_frightened)
+SCENARIOS['dying'] = (setup_dying, keep_dying)
+SCENARIOS['high-scores'] = (setup_high_scores, None)
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not samples:
+        return 0.0
+    rank = max(0, min(len(samples), math.ceil(pct / 100.0 * len(samples))) - 1)
+    return samples[rank]
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        'p50_ms': round(percentile(samples, 50), 4),
+        'p95_ms': round(percentile(samples, 95), 4),
+        'p99_ms': round(percentile(samples, 99), 4),
+        'mean_ms': round(sum(samples) / len(samples), 4) if samples else 0.0,
+    }
+
+
+def run_scenario(game, name, frames, warmup):
+    setup, hook = SCENARIOS[name]
+    setup(game)
+    moves = random.Random(BENCH_SEED)
+    update_ms = []
+    draw_ms = []
+    clock = time.perf_counter
+    for frame in range(warmup + frames):
+        if hook is not None:
+            hook(game)
+        if frame % 15 == 0:
+            game.input_dir = moves.choice(openpac.INPUT_DIRS[1:])
+        pygame.event.pump()
+        t0 = clock()
+        game.update()
+        t1 = clock()
+        game.draw(0.5)
+        t2 = clock()
+        if frame >= warmup:
+            update_ms.append((t1 - t0) * 1000.0)
+            draw_ms.append((t2 - t1) * 1000.0)
+    return {'frames': frames, 'update': summarize(update_ms), 'draw': summarize(draw_ms)}
+
+
+def run(names=None, frames=600, warmup=60, swarm_size=0):
+    game = openpac.Game(swarm_size=swarm_size, seed=BENCH_SEED, max_fps=0)
+    game.finish_startup()
+    results = {
+        'version': RESULTS_VERSION,
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'platform': platform.platform(),
+        'swarm_size': swarm_size,
+        'scenarios': {},
+    }
+    for name in names or SCENARIOS:
+        results['scenarios'][name] = run_scenario(game, name, frames, warmup)
+    pygame.quit()
+    return results
+
+
+def compare(results, baseline, tolerance=0.25, metric='p95_ms'):
+    """Scenario/phase pairs where `metric` got more than `tolerance` slower than the baseline."""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if base is None:
+            continue
+        for phase in ('update', 'draw'):
+            old, new = base[phase][metric], current[phase][metric]
+            if old > 0 and new > old * (1 + tolerance):
+                regressions.append((name, phase, old, new))
+    return regressions
+
+
+def format_table(results):
+    lines = [f"{'scenario':<18} {'phase':<7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"]
+    for name, res in results['scenarios'].items():
+        for phase in ('update', 'draw'):
+            s = res[phase]
+            lines.append(f"{name:<18} {phase:<7} {s['p50_ms']:>8.3f} {s['p95_ms']:>8.3f} {s['p99_ms']:>8.3f}")
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Open-Pac frame-time benchmark")
+    parser.add_argument('scenarios', nargs='*', metavar='SCENARIO',
+                        help=f"scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument('--frames', type=int, default=600, help="measured frames per scenario")
+    parser.add_argument('--warmup', type=int, default=60, help="unmeasured frames before each scenario")
+    parser.add_argument('--ghosts', type=int, default=0, metavar='N',
+                        help="run the scenarios in stress mode with N swarm ghosts")
+    parser.add_argument('--json', metavar='FILE', help="write the results to FILE")
+    parser.add_argument('--baseline', metavar='FILE',
+                        help="compare against results saved with --json; exit 1 on a regression")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed p95 slowdown against the baseline (default 0.25 = 25%%)")
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    results = run(args.scenarios, args.frames, args.warmup, args.ghosts)
+    print(format_table(results))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, phase, old, new in regressions:
+            print(f"REGRESSION {name} {phase}: p95 {old:.3f} ms -> {new:.3f} ms", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,181 @@
+"""Gym-style environments over the headless Open-Pac simulation.
+
+OpenPacEnv plays one game with the usual reset()/step() API; VectorOpenPacEnv
+steps N games in lockstep in one process and returns batched arrays. Both
+need numpy. If gymnasium is installed OpenPacEnv is a gymnasium.Env with
+matching observation and action spaces; otherwise it works the same without.
+
+    env = VectorOpenPacEnv(64, seed=0)
+    obs, info = env.reset()
+    obs, reward, terminated, truncated, info = env.step(actions)
+
+Actions are 0 = keep going, 1 = up, 2 = down, 3 = left, 4 = right.
+Observations are a dict of arrays: 'maze' (TILE_* attribute bits per tile),
+'pellets' (1 where a pellet is left), 'player' (x, y in tiles, dx, dy),
+'ghosts' (x, y in tiles, mode per ghost; see GHOST_MODES) and 'stats'
+(lives, level). Rewards are the score gained (pellets, power pellets, ghosts,
+fruit), minus `death_penalty` for each life lost.
+"""
+import os
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import numpy as np
+
+import openpac
+from openpac import TILE, FPS, WIDTH, HEIGHT
+
+try:
+    import gymnasium as gym
+    from gymnasium import spaces
+except ImportError:  # the environments work without it, just not as gymnasium.Env
+    gym = None
+
+GHOST_MODES = {'house': 0, 'leaving': 1, 'active': 2, 'frightened': 3}  # same codes as GhostSwarm
+ACTIONS = openpac.INPUT_DIRS  # index = action
+OVER = ('GAME_OVER', 'ENTER_INITIALS')
+
+
+def ghost_count(sim):
+    return sim.swarm.count if sim.swarm is not None else len(sim.ghosts)
+
+
+def advance(sim, action, frame_skip):
+    """Apply `action` for `frame_skip` ticks, then run through READY, DYING and
+    LEVEL_COMPLETE so the next observation is a state where the action matters.
+    Returns (reward points, lives lost, ticks)."""
+    score, lives = sim.score, sim.lives
+    direction = ACTIONS[action]
+    ticks = 0
+    for _ in range(frame_skip):
+        sim.step(direction)
+        ticks += 1
+        if sim.state != 'PLAYING':
+            break
+    while sim.state in ('READY', 'DYING', 'LEVEL_COMPLETE'):
+        sim.step(select=sim.state != 'DYING')
+        ticks += 1
+    return sim.score - score, lives - sim.lives, ticks
+
+
+class VectorOpenPacEnv:
+    """N headless games stepped in lockstep, with batched NumPy observations.
+
+    Finished games are reset automatically; the step that ended one reports
+    terminated/truncated for it and already returns the new game's observation.
+    Output arrays are reused between steps, so copy them if you keep them.
+    """
+    def __init__(self, num_envs, seed=None, frame_skip=1, max_ticks=10 * 60 * FPS,
+                 death_penalty=0.0, swarm_size=0, curve=None):
+        self.num_envs = num_envs
+        self.frame_skip = frame_skip
+        self.max_ticks = max_ticks
+        self.death_penalty = death_penalty
+        base = seed if seed is not None else np.random.SeedSequence().entropy % 2**32
+        self.seeds = [base + i for i in range(num_envs)]
+        self.sims = [openpac.Simulation(seed=s, swarm_size=swarm_size, curve=curve) for s in self.seeds]
+        self.ticks = np.zeros(num_envs, dtype=np.int64)
+        self.games = np.zeros(num_envs, dtype=np.int64)  # games finished per env, for reseeding
+        self.layouts = [None] * num_envs  # TileMap last copied into obs['maze'][i]
+        ghosts = ghost_count(self.sims[0])
+        cells = WIDTH * HEIGHT
+        self.pellet_bytes = np.zeros((num_envs, (cells + 7) // 8), dtype=np.uint8)
+        self.obs = {
+            'maze': np.zeros((num_envs, HEIGHT, WIDTH), dtype=np.uint8),
+            'pellets': np.zeros((num_envs, HEIGHT, WIDTH), dtype=np.uint8),
+            'player': np.zeros((num_envs, 4), dtype=np.float32),
+            'ghosts': np.zeros((num_envs, ghosts, 3), dtype=np.float32),
+            'stats': np.zeros((num_envs, 2), dtype=np.int32),
+        }
+        self.reward = np.zeros(num_envs, dtype=np.float32)
+        self.terminated = np.zeros(num_envs, dtype=bool)
+        self.truncated = np.zeros(num_envs, dtype=bool)
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.seeds = [seed + i for i in range(self.num_envs)]
+            self.games[:] = 0
+        for i in range(self.num_envs):
+            self.reset_env(i)
+        self.observe_all()
+        return self.obs, {}
+
+    def reset_env(self, i):
+        # Every game of every env gets its own seed, reproducible from the first one
+        self.sims[i].new_game(seed=self.seeds[i] + int(self.games[i]) * self.num_envs)
+        self.ticks[i] = 0
+
+    def step(self, actions):
+        info = {'final_score': np.full(self.num_envs, -1, dtype=np.int64)}
+        for i, sim in enumerate(self.sims):
+            points, lost, ticks = advance(sim, int(actions[i]), self.frame_skip)
+            self.ticks[i] += ticks
+            self.reward[i] = points - lost * self.death_penalty
+            self.terminated[i] = sim.state in OVER
+            self.truncated[i] = not self.terminated[i] and self.ticks[i] >= self.max_ticks
+            if self.terminated[i] or self.truncated[i]:
+                info['final_score'][i] = sim.score
+                self.games[i] += 1
+                self.reset_env(i)
+        self.observe_all()
+        return self.obs, self.reward, self.terminated, self.truncated, info
+
+    def observe_all(self):
+        obs = self.obs
+        player, ghosts, stats = obs['player'], obs['ghosts'], obs['stats']
+        for i, sim in enumerate(self.sims):
+            if self.layouts[i] is not sim.tiles:  # the layout only changes with the level
+                self.layouts[i] = sim.tiles
+                obs['maze'][i] = np.frombuffer(sim.tiles.attrs, dtype=np.uint8).reshape(HEIGHT, WIDTH)
+            self.pellet_bytes[i] = np.frombuffer(sim.pellets.bits, dtype=np.uint8)
+            p = sim.player
+            player[i] = (p.x / TILE, p.y / TILE, p.dir[0], p.dir[1])
+            if sim.swarm is not None:
+                ghosts[i, :, 0] = sim.swarm.x / TILE
+                ghosts[i, :, 1] = sim.swarm.y / TILE
+                ghosts[i, :, 2] = sim.swarm.mode
+            else:
+                for k, g in enumerate(sim.ghosts):
+                    ghosts[i, k] = (g.x / TILE, g.y / TILE, GHOST_MODES[g.mode])
+            stats[i] = (sim.lives, sim.level)
+        cells = WIDTH * HEIGHT
+        bits = np.unpackbits(self.pellet_bytes, axis=1, count=cells, bitorder='little')
+        obs['pellets'][:] = bits.reshape(self.num_envs, HEIGHT, WIDTH)
+
+
+class OpenPacEnv(gym.Env if gym is not None else object):
+    """A single game with the gymnasium reset()/step() API (see the module docstring)."""
+    metadata = {'render_modes': []}
+
+    def __init__(self, seed=None, frame_skip=1, max_ticks=10 * 60 * FPS, death_penalty=0.0,
+                 swarm_size=0, curve=None):
+        self.vec = VectorOpenPacEnv(1, seed, frame_skip, max_ticks, death_penalty, swarm_size, curve)
+        self.sim = self.vec.sims[0]
+        if gym is not None:
+            ghosts = ghost_count(self.sim)
+            self.action_space = spaces.Discrete(len(ACTIONS))
+            self.observation_space = spaces.Dict({
+                'maze': spaces.Box(0, 255, (HEIGHT, WIDTH), dtype=np.uint8),
+                'pellets': spaces.Box(0, 1, (HEIGHT, WIDTH), dtype=np.uint8),
+                'player': spaces.Box(-np.inf, np.inf, (4,), dtype=np.float32),
+                'ghosts': spaces.Box(-np.inf, np.inf, (ghosts, 3), dtype=np.float32),
+                'stats': spaces.Box(0, np.iinfo(np.int32).max, (2,), dtype=np.int32),
+            })
+
+    def observation(self):
+        return {key: value[0].copy() for key, value in self.vec.obs.items()}
+
+    def reset(self, seed=None, options=None):
+        self.vec.reset(seed)
+        return self.observation(), {'seed': self.sim.seed}
+
+    def step(self, action):
+        # Single game: no auto-reset, the caller resets after a terminal step
+        vec, sim = self.vec, self.sim
+        points, lost, ticks = advance(sim, int(action), vec.frame_skip)
+        vec.ticks[0] += ticks
+        terminated = sim.state in OVER
+        truncated = not terminated and vec.ticks[0] >= vec.max_ticks
+        vec.observe_all()
+        info = {'score': sim.score, 'lives': sim.lives, 'level': sim.level, 'ticks': int(vec.ticks[0])}
+        return self.observation(), float(points - lost * vec.death_penalty), terminated, truncated, info
@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def path_cache(tmp_path, monkeypatch):
+    """Keep the ghost path-table cache out of the user's home directory."""
+    monkeypatch.setenv('OPENPAC_CACHE', str(tmp_path / 'cache'))
@@ -0,0 +1,63 @@
+"""Replays of recorded games must end in exactly the recorded state."""
+import os
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+import pytest
+
+from openpac import Game, InputLog, Simulation, encode_input
+
+
+def play_until(sim, state, log=None, limit=20000):
+    """Step with no input until `state` (or game over), recording into `log`."""
+    for _ in range(limit):
+        if sim.state in (state, 'GAME_OVER', 'ENTER_INITIALS'):
+            return
+        if log is not None:
+            log.inputs.append(encode_input())
+        sim.step()
+
+
+def test_replay_after_skipped_ready_on_reused_sim(tmp_path):
+    sim = Simulation()
+    # Game 1: die, then skip the READY pause with ENTER part way through
+    sim.new_game(seed=1)
+    play_until(sim, 'READY')
+    assert sim.state == 'READY'
+    for _ in range(30):
+        sim.step()
+    sim.step(select=True)
+    # Game 2 on the same Simulation, recorded through its first respawn
+    sim.new_game(seed=2)
+    log = InputLog(sim.seed)
+    play_until(sim, 'READY', log)
+    assert sim.state == 'READY'
+    play_until(sim, 'DYING', log)
+    path = tmp_path / 'game.json'
+    log.save(path, sim)
+    replayed = InputLog.load(path).replay()
+    assert replayed.score == sim.score
+    assert replayed.state_hash() == sim.state_hash()
+
+
+@pytest.mark.parametrize('key', [pygame.K_ESCAPE, pygame.K_END], ids=['esc', 'end'])
+def test_replay_of_game_left_mid_play(tmp_path, monkeypatch, key):
+    monkeypatch.setenv('SDL_VIDEODRIVER', 'dummy')
+    monkeypatch.setenv('SDL_AUDIODRIVER', 'dummy')
+    monkeypatch.chdir(tmp_path)  # the high score files
+    game = Game(seed=7, record_dir=str(tmp_path / 'games'), max_fps=0)
+    press = lambda k: pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=k, mod=0, unicode='', scancode=0))
+    press(pygame.K_RETURN)
+    game.handle_input()
+    for _ in range(300):
+        game.update()
+    # ESC (menu) or END (high scores) leaves the game outside Simulation.step
+    press(key)
+    game.handle_input()
+    game.update()
+    game.hs.close()
+    [path] = (tmp_path / 'games').glob('*.json')
+    log = InputLog.load(path)
+    assert len(log.inputs) == 300
+    assert log.replay().state_hash() == log.final_hash